@@ -0,0 +1,4 @@
+#! /usr/bin/python3.6
+'''
+Benchmarks for the Methane Analysis Service.
+'''
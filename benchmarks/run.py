@@ -0,0 +1,305 @@
+#! /usr/bin/python3.6
+'''
+Benchmark Ingestion, Filtering, and Detection of the Methane Analysis Service on
+Synthetic TROPOMI-Like Data, and Compare the Results against a Saved Baseline.
+
+Run from the Repository Root:
+    python -m benchmarks.run --sizes 10000 100000 --out bench.json
+    python -m benchmarks.run --sizes 10000 100000 --baseline bench.json
+'''
+
+# System Functions
+import os
+import sys
+import json
+import time
+import copy
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import warnings
+import yaml
+
+# Data-Related Functions
+import numpy as np
+from benchmarks import synthetic
+from software import metrics
+from software.timing import getVersion
+
+# Benchmark Stages, in Pipeline Order
+STAGES = ['collectData', 'getDataFromH5', 'applyDateFilter', 'enforceBoundingBox', 'removeCommonData',
+          'Local Outlier Factor', 'Isolation Forest', 'Autoencoder']
+DETECTORS = STAGES[5:]
+
+# Create the Description
+DESC = '''Benchmarks the Methane Analysis Pipeline Stages on Synthetic Data.'''
+
+# Setup the Command Line Interface
+parser = argparse.ArgumentParser(description = DESC)
+parser.add_argument('--config', '-c',
+                    default = 'config.yml',
+                    help = 'Path to the Configuration YAML File.')
+parser.add_argument('--sizes', '-s',
+                    nargs = '+',
+                    type = int,
+                    default = [10 ** 4, 10 ** 5, 10 ** 6],
+                    help = 'Numbers of Pixels to Benchmark (e.g. 10000 ... 10000000).')
+parser.add_argument('--stages',
+                    nargs = '+',
+                    choices = STAGES,
+                    default = STAGES[:7],
+                    help = 'Stages to Benchmark (the Autoencoder is Opt-In).')
+parser.add_argument('--layout',
+                    choices = ['flat', 'chunked'],
+                    help = 'Override the H5 Storage Layout from the Configuration.')
+parser.add_argument('--compression',
+                    choices = ['none', 'gzip', 'lz4', 'blosc'],
+                    help = 'Override the H5 Compression from the Configuration.')
+parser.add_argument('--schema',
+                    choices = ['compact', 'full'],
+                    help = 'Override the In-Memory/On-Disk Schema from the Configuration.')
+parser.add_argument('--neighborIndex',
+                    choices = ['exact', 'projection'],
+                    help = 'Override the Local Outlier Factor Neighbour Index from the Configuration.')
+parser.add_argument('--validationSample',
+                    type = int,
+                    default = 10000,
+                    help = 'Rows to Check an Approximate LOF against Exact Neighbours On.')
+parser.add_argument('--maxDetectorRows',
+                    type = int,
+                    default = 10 ** 6,
+                    help = 'Skip Detectors when More Rows than this Survive Thresholding.')
+parser.add_argument('--repeat', '-r',
+                    type = int,
+                    default = 1,
+                    help = 'Repetitions per Stage (the Fastest is Kept).')
+parser.add_argument('--out', '-o',
+                    help = 'Write the Results JSON to this File.')
+parser.add_argument('--baseline', '-b',
+                    help = 'Compare against a Saved Results JSON File.')
+parser.add_argument('--tolerance', '-t',
+                    type = float,
+                    default = 0.25,
+                    help = 'Allowed Fractional Slowdown before a Stage Counts as a Regression.')
+parser.add_argument('--minSeconds',
+                    type = float,
+                    default = 0.01,
+                    help = 'Ignore Slowdowns Smaller than this many Seconds (Timer Noise).')
+parser.add_argument('--seed',
+                    type = int,
+                    default = 582,
+                    help = 'The Random Seed for the Synthetic Data.')
+
+def measure(function, numRows, repeat = 1, release = None):
+    '''
+    Time a Stage and Record its Peak Python/NumPy Allocation. Tracing Allocations
+    Slows the Stage, so the Timed Runs are Untraced and the Peak Comes from One
+    Further Traced Run.
+
+    :param function: A Callable Running the Stage.
+    :param numRows: The Number of Input Rows (for Throughput).
+    :param repeat: Timed Repetitions (the Fastest is Kept).
+    :param release: A Callable Releasing a Discarded Result (Such as an Open H5 File).
+    :return: The Stage Result and a Dictionary of Measurements.
+    '''
+    best = None
+    for i in range(repeat):
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+        result = function()
+        wallSeconds = time.perf_counter() - wallStart
+        cpuSeconds = time.process_time() - cpuStart
+        if release is not None:
+            release(result)
+        if best is None or wallSeconds < best['seconds']:
+            best = {'seconds': wallSeconds,
+                    'cpuSeconds': cpuSeconds,
+                    'rows': int(numRows),
+                    'rowsPerSecond': numRows / wallSeconds if wallSeconds > 0 else None}
+
+    # Measure through a Stage Record, so Peaks of the Pipeline's Own
+    # Instrumented Stages Fold into this One
+    tracemalloc.start()
+    with metrics.MetricsRegistry().stage('benchmark') as record:
+        result = function()
+    best['peakBytes'] = record['peakBytes'] if record['peakBytes'] is not None else tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best
+
+def benchmarkSize(config, numPixels, stages, args):
+    '''
+    Run Every Selected Stage on One Synthetic Data Size.
+
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :param numPixels: The Number of Pixels to Generate.
+    :param stages: The Stages to Run.
+    :param args: The CLI Arguments.
+    :return: A Map of Stage Names to Measurements.
+    '''
+    from software.collect import collector
+    from software.analyze import analyzer
+    from software.analyze.AnomalyDetector import AnomalyDetector
+    from h5py import File
+    results = {}
+
+    # Import the Detector Backends Up Front so their Import Cost is Not Timed
+    if 'Local Outlier Factor' in stages or 'Isolation Forest' in stages:
+        import sklearn.neighbors, sklearn.ensemble
+    if 'Autoencoder' in stages:
+        import pyod.models.auto_encoder
+
+    # `collectData` Reads/Writes Relative to `data/`, so Work in a Scratch Directory
+    workDir = tempfile.mkdtemp(prefix = 'tropomi_bench_')
+    cwd = os.getcwd()
+    os.chdir(workDir)
+    os.mkdir('data')
+    try:
+        h5Path = os.path.join('data', config['model']['h5FileName'])
+        if 'collectData' in stages:
+            ncList = synthetic.writeOrbits('data', config, numPixels, seed = args.seed)
+            M, measurements = measure(lambda: collector.collectData(config, ncList), numPixels, args.repeat,
+                                      lambda h5File: h5File.close())
+
+            # Report the Rows Actually Collected (the Box and Quality Filters Drop Some)
+            measurements['rows'] = int(M['latitude'].shape[0])
+            measurements['rowsPerSecond'] = measurements['rows'] / measurements['seconds'] \
+                                            if measurements['seconds'] > 0 else None
+            results['collectData'] = measurements
+            M.close()
+        else:
+            synthetic.writeH5(h5Path, config, numPixels, seed = args.seed)
+        results['bytesOnDisk'] = os.path.getsize(h5Path)
+
+        # Loading and Filtering Stages
+        if 'getDataFromH5' in stages:
+            M, results['getDataFromH5'] = measure(lambda: collector.getDataFromH5(config), numPixels, args.repeat)
+            results['getDataFromH5']['rowsLoaded'] = int(M['latitude'].shape[0])
+        h5File = File(h5Path, 'r')
+        numRows = h5File['latitude'].shape[0]
+        M, measurements = measure(lambda: collector.applyDateFilter(config, h5File), numRows, args.repeat)
+        h5File.close()
+        if 'applyDateFilter' in stages:
+            results['applyDateFilter'] = measurements
+        if 'enforceBoundingBox' in stages:
+            latBox = (config['model']['latLower'], (config['model']['latLower'] + config['model']['latUpper']) / 2.0)
+            lonBox = (config['model']['lonLower'], config['model']['lonUpper'])
+            M, results['enforceBoundingBox'] = measure(lambda: analyzer.enforceBoundingBox(M, latBox, lonBox),
+                                                       M['latitude'].shape[0], args.repeat)
+
+        # Thresholding and Detection Stages
+        numRows = M['latitude'].shape[0]
+        hpMap = config['AnomalyDetector']['IsolationForestHyperparameters']
+        AD = AnomalyDetector(config, M)
+        (yStar, idxList), measurements = measure(lambda: AD.removeCommonData(hpMap['spreadStatistic'],
+                                                                             hpMap['threshold']),
+                                                 numRows, args.repeat)
+        if 'removeCommonData' in stages:
+            results['removeCommonData'] = measurements
+        for method in DETECTORS:
+            if method not in stages:
+                continue
+            if yStar.shape[0] > args.maxDetectorRows:
+                print('Skipping %s: %d Rows Exceed --maxDetectorRows' % (method, yStar.shape[0]))
+                continue
+            methodConfig = copy.deepcopy(config)
+            methodConfig['AnomalyDetector']['method'] = method
+            methodConfig['AnomalyDetector']['AutoencoderHyperparameters']['plotScores'] = False
+            methodConfig['AnomalyDetector']['LocalOutlierFactorHyperparameters']['validationSample'] = 0
+            detector = AnomalyDetector(methodConfig, M)
+            anomalies, results[method] = measure(detector.detectAnomalies, numRows, args.repeat)
+            results[method]['anomalies'] = len(anomalies)
+
+            # Check an Approximate LOF against Exact Neighbours (Outside the Timing)
+            lofMap = methodConfig['AnomalyDetector']['LocalOutlierFactorHyperparameters']
+            if method == 'Local Outlier Factor' and lofMap.get('neighborIndex', 'exact') != 'exact' and \
+               args.validationSample > 0 and yStar.shape[0] > 1:
+                from software.analyze import neighbors
+                X = yStar.reshape(-1, 1)
+                distances, indices = neighbors.getIndex(lofMap['neighborIndex'], X, lofMap) \
+                                              .query(min(lofMap['numNeighbors'], yStar.shape[0] - 1))
+                results[method]['accuracy'] = neighbors.validate(X, distances, indices, lofMap['neighborIndex'],
+                                                                 lofMap, args.validationSample)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workDir, ignore_errors = True)
+    return results
+
+def compare(current, baseline, tolerance, minSeconds = 0.0):
+    '''
+    Compare Stage Times against a Baseline.
+
+    :param current: The Current Results Dictionary.
+    :param baseline: The Baseline Results Dictionary.
+    :param tolerance: The Allowed Fractional Slowdown.
+    :param minSeconds: The Smallest Absolute Slowdown that Counts.
+    :return: A List of (size, stage, baselineSeconds, currentSeconds) Regressions.
+    '''
+    regressions = []
+    print('\n%-10s %-22s %12s %12s %8s' % ('pixels', 'stage', 'baseline s', 'current s', 'ratio'))
+    for size, stages in current['results'].items():
+        for stage in STAGES:
+            if stage not in stages or stage not in baseline['results'].get(size, {}):
+                continue
+            old = baseline['results'][size][stage]['seconds']
+            new = stages[stage]['seconds']
+            ratio = new / old if old > 0 else float('inf')
+            flag = ' <-- REGRESSION' if ratio > 1.0 + tolerance and new - old > minSeconds else ''
+            print('%-10s %-22s %12.4f %12.4f %8.2f%s' % (size, stage, old, new, ratio, flag))
+            if flag:
+                regressions.append((size, stage, old, new))
+    return regressions
+
+def main(argv = None):
+    args = parser.parse_args(argv)
+    if not sys.warnoptions:
+        warnings.simplefilter('ignore')
+    with open(args.config, 'r') as ymlFile:
+        config = yaml.load(ymlFile, yaml.SafeLoader)
+    if args.layout is not None:
+        config['model']['h5Layout'] = args.layout
+    if args.compression is not None:
+        config['model']['h5Compression'] = None if args.compression == 'none' else args.compression
+    if args.schema is not None:
+        config['model']['compactSchema'] = args.schema == 'compact'
+    if args.neighborIndex is not None:
+        config['AnomalyDetector']['LocalOutlierFactorHyperparameters']['neighborIndex'] = args.neighborIndex
+
+    # Benchmark Each Size
+    report = {'version': getVersion(),
+              'python': sys.version.split()[0],
+              'numpy': np.__version__,
+              'platform': platform.platform(),
+              'cpus': os.cpu_count(),
+              'stages': args.stages,
+              'h5Layout': config['model'].get('h5Layout'),
+              'h5Compression': config['model'].get('h5Compression'),
+              'compactSchema': bool(config['model'].get('compactSchema', False)),
+              'neighborIndex': config['AnomalyDetector']['LocalOutlierFactorHyperparameters'].get('neighborIndex'),
+              'results': {}}
+    for numPixels in args.sizes:
+        print('Benchmarking %d Pixels...' % numPixels)
+        report['results'][str(numPixels)] = benchmarkSize(config, numPixels, args.stages, args)
+        for stage, m in report['results'][str(numPixels)].items():
+            if isinstance(m, dict):
+                print('  %-22s %10.4f s %14.0f rows/s %10.1f MB' % \
+                      (stage, m['seconds'], m['rowsPerSecond'] or 0, m['peakBytes'] / 2.0 ** 20))
+                if 'accuracy' in m:
+                    print('  %-22s recall %.4f, score rank correlation %.4f' % \
+                          ('', m['accuracy']['neighborRecall'], m['accuracy']['scoreRankCorrelation']))
+
+    # Save and Compare
+    if args.out:
+        with open(args.out, 'w') as fout:
+            json.dump(report, fout, indent = 2)
+    if args.baseline:
+        with open(args.baseline, 'r') as fin:
+            regressions = compare(report, json.load(fin), args.tolerance, args.minSeconds)
+        if regressions:
+            print('\n%d Stage(s) Regressed beyond %.0f%%.' % (len(regressions), 100 * args.tolerance))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
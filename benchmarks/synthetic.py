@@ -0,0 +1,171 @@
+#! /usr/bin/python3.6
+'''
+Generate Synthetic TROPOMI-Like Orbit NetCDF Files and H5 Stores for Benchmarks.
+
+The Orbit Files Use the Same Group Layout (PRODUCT, PRODUCT/SUPPORT_DATA/...)
+and Variable Shapes (1 x Scanline x Ground Pixel) that `collectData` Expects.
+'''
+
+# System Functions
+import os
+import math
+
+# Data-Related Functions
+import numpy as np
+from software.collect import schema, storage
+
+# Orbit Geometry
+GROUND_PIXELS = 215
+PIXELS_PER_ORBIT = 250000
+FILL_VALUE = 9.96921e+36
+
+# NetCDF Groups, Keyed by the Configuration Variable List they Hold
+GROUPS = {'prodVars': 'PRODUCT',
+          'geoVars': 'PRODUCT/SUPPORT_DATA/GEOLOCATIONS',
+          'detailedVars': 'PRODUCT/SUPPORT_DATA/DETAILED_RESULTS',
+          'inputVars': 'PRODUCT/SUPPORT_DATA/INPUT_DATA'}
+
+def _getGroup(ncFile, path):
+    group = ncFile
+    for name in path.split('/'):
+        group = group.groups[name] if name in group.groups else group.createGroup(name)
+    return group
+
+def _fakeVariable(name, rng, shape, methane):
+    '''
+    Make Plausible Values for a TROPOMI Variable.
+    '''
+    if name == 'qa_value':
+        return rng.choice([0.0, 0.4, 0.5, 1.0], size = shape, p = [0.1, 0.2, 0.2, 0.5])
+    if name == 'surface_classification':
+        return rng.randint(0, 8, size = shape).astype(np.float32)
+    if name.endswith('zenith_angle'):
+        return rng.uniform(0.0, 80.0, shape)
+    if name.startswith('methane_mixing_ratio'):
+        return methane + (rng.normal(0.0, 1.0, shape) if name.endswith('precision') else 0.0)
+    return rng.normal(1.0, 0.1, shape)
+
+def writeOrbit(fileName, config, numScanlines, startSeconds, latRange, lonRange, seed = 0):
+    '''
+    Write One Synthetic Orbit NetCDF File.
+
+    :param fileName: The Path of the Orbit File.
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :param numScanlines: The Number of Scanlines in the Orbit.
+    :param startSeconds: The Orbit Reference Time in Seconds since 2010-01-01.
+    :param latRange: The (min, max) Latitude Swept by the Orbit.
+    :param lonRange: The (min, max) Longitude Swept by the Orbit.
+    :param seed: The Random Seed.
+    '''
+    from netCDF4 import Dataset
+    rng = np.random.RandomState(seed)
+    shape = (1, numScanlines, GROUND_PIXELS)
+
+    # Sweep the Swath North along the Scanlines and East across the Ground Pixels
+    lat = np.linspace(latRange[0], latRange[1], numScanlines)[:, None] * np.ones(GROUND_PIXELS)
+    lon = np.ones(numScanlines)[:, None] * np.linspace(lonRange[0], lonRange[1], GROUND_PIXELS)
+    lat = lat[None] + rng.normal(0.0, 0.01, shape)
+    lon = lon[None] + rng.normal(0.0, 0.01, shape)
+
+    # Background Methane with a Few Injected Plumes
+    methane = rng.normal(1850.0, 15.0, shape)
+    plumes = rng.rand(*shape) < 1e-3
+    methane[plumes] += rng.uniform(50.0, 200.0, plumes.sum())
+
+    with Dataset(fileName, 'w') as ncFile:
+        ncFile.createDimension('time', 1)
+        ncFile.createDimension('scanline', numScanlines)
+        ncFile.createDimension('ground_pixel', GROUND_PIXELS)
+        ncFile.createDimension('corner', 4)
+        dims = ('time', 'scanline', 'ground_pixel')
+        for listName, path in GROUPS.items():
+            group = _getGroup(ncFile, path)
+            for v in config['model'][listName]:
+                if v == 'time':
+                    group.createVariable(v, 'i4', ('time',))[:] = [int(startSeconds)]
+                elif v == 'time_utc':
+                    continue
+                elif v in ('latitude', 'longitude'):
+                    group.createVariable(v, 'f4', dims)[:] = lat if v == 'latitude' else lon
+                elif v in ('latitude_bounds', 'longitude_bounds'):
+                    center = lat if v == 'latitude_bounds' else lon
+                    offsets = np.array([-0.02, -0.02, 0.02, 0.02]) if v == 'latitude_bounds' \
+                              else np.array([-0.03, 0.03, 0.03, -0.03])
+                    group.createVariable(v, 'f4', dims + ('corner',))[:] = center[..., None] + offsets
+                else:
+                    variable = group.createVariable(v, 'f4', dims, fill_value = FILL_VALUE)
+                    variable[:] = _fakeVariable(v, rng, shape, methane)
+        product = ncFile.groups['PRODUCT']
+        deltaTime = product.createVariable('delta_time', 'i4', ('time', 'scanline'))
+        deltaTime[:] = (np.arange(numScanlines) * 840)[None]
+
+def writeOrbits(directory, config, numPixels, seed = 0):
+    '''
+    Split `numPixels` Pixels across Enough Orbit Files to Keep Each near a
+    Realistic Orbit Size, Spaced One Orbit (~100 Minutes) Apart.
+
+    :param directory: The Directory to Write the Orbit Files In.
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :param numPixels: The Total Number of Pixels to Generate.
+    :param seed: The Random Seed.
+    :return: A List of the Orbit File Paths.
+    '''
+    numOrbits = max(1, int(math.ceil(numPixels / float(PIXELS_PER_ORBIT))))
+    numScanlines = max(1, int(math.ceil(numPixels / float(numOrbits * GROUND_PIXELS))))
+    startSeconds = (np.datetime64(config['model']['startDate'] or '2019-01-01') - \
+                    np.datetime64('2010-01-01')).astype('timedelta64[s]').astype(np.int64)
+    latRange = (config['model']['latLower'], config['model']['latUpper'])
+    ncList = []
+    for i in range(numOrbits):
+        lonLower = config['model']['lonLower'] + (i % 4)
+        fileName = os.path.join(directory, 'S5P_SYNTH_L2__CH4____%04d.nc' % i)
+        writeOrbit(fileName, config, numScanlines, startSeconds + i * 6000, latRange,
+                   (lonLower, config['model']['lonUpper']), seed = seed + i)
+        ncList.append(fileName)
+    return ncList
+
+def writeH5(fileName, config, numPixels, seed = 0):
+    '''
+    Write an H5 Store with the Per-Pixel Layout `collectData` Produces (in the
+    Configured Storage Layout), without Going through NetCDF.
+
+    :param fileName: The Path of the H5 File.
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :param numPixels: The Number of Pixels (Rows).
+    :param seed: The Random Seed.
+    '''
+    rng = np.random.RandomState(seed)
+    startSeconds = (np.datetime64(config['model']['startDate'] or '2019-01-01') - \
+                    np.datetime64('2010-01-01')).astype('timedelta64[s]').astype(np.float64)
+    endSeconds = (np.datetime64(config['model']['endDate'] or '2019-03-31') - \
+                  np.datetime64('2010-01-01')).astype('timedelta64[s]').astype(np.float64)
+    lat = rng.uniform(config['model']['latLower'], config['model']['latUpper'], numPixels)
+    lon = rng.uniform(config['model']['lonLower'], config['model']['lonUpper'], numPixels)
+    methane = rng.normal(1850.0, 15.0, numPixels)
+    plumes = rng.rand(numPixels) < 1e-3
+    methane[plumes] += rng.uniform(50.0, 200.0, plumes.sum())
+    columns = {}
+    for listName in GROUPS:
+        for v in config['model'][listName]:
+            if v in ('time_utc', 'latitude_bounds', 'longitude_bounds'):
+                continue
+            elif v == 'latitude':
+                columns[v] = lat
+            elif v == 'longitude':
+                columns[v] = lon
+            elif v == 'time':
+                columns[v] = rng.uniform(startSeconds, endSeconds, numPixels)
+            else:
+                columns[v] = _fakeVariable(v, rng, numPixels, methane)
+    for corner, (dLat, dLon) in {'LowLeft': (-0.02, -0.03), 'LowRight': (-0.02, 0.03),
+                                 'UpRight': (0.02, 0.03), 'UpLeft': (0.02, -0.03)}.items():
+        columns['lat' + corner] = lat + dLat
+        columns['lon' + corner] = lon + dLon
+    attributes = None
+    if schema.isCompact(config):
+        columns, attributes = schema.toCompact(columns, config)
+    storage.writeH5(fileName, columns,
+                    layout = config['model'].get('h5Layout', storage.DEFAULT_LAYOUT),
+                    chunkRows = config['model'].get('h5ChunkRows', storage.DEFAULT_CHUNK_ROWS),
+                    compression = config['model'].get('h5Compression'),
+                    attributes = attributes)
@@ -42,5 +42,5 @@ setup(
     url = 'https://github.com/dykstal/MATH582',
     include_package_data = True,
     install_requires = getRequirements(),
-    packages = find_packages(exclude = ('data', 'tests', 'docs'))
+    packages = find_packages(exclude = ('data', 'tests', 'docs', 'benchmarks'))
 )
@@ -8,13 +8,40 @@ import os
 import sys
 import errno
 import json
+import logging
+import concurrent.futures
 import numpy as np
+from software import metrics
+logger = logging.getLogger(__name__)
 
-# Analytic Functions
-from sklearn.neighbors import LocalOutlierFactor
-from sklearn.ensemble import IsolationForest
-from pyod.models.auto_encoder import AutoEncoder
-import matplotlib.pyplot as plt
+# Analytic Functions (scikit-learn, pyod/Keras, and matplotlib) are Imported
+# inside the Detection Method that Uses Them, so Selecting One Method Never
+# Pays the Import Cost of the Others
+
+# Ensemble Methods: Name -> (Scoring Method, Hyperparameter Section)
+SCORERS = {'Local Outlier Factor': ('scoreWithLocalOutlierFactor', 'LocalOutlierFactorHyperparameters'),
+           'Isolation Forest': ('scoreWithIsolationForest', 'IsolationForestHyperparameters'),
+           'Autoencoder': ('scoreWithAutoencoder', 'AutoencoderHyperparameters')}
+
+def normalizeScores(scores, normalization = 'rank'):
+    '''
+    Put One Method's Anomaly Scores on a Common Scale.
+
+    :param scores: The Anomaly Scores (Higher is More Anomalous).
+    :param normalization: 'rank' (Tie-Averaged Percentile in [0, 1]) OR 'zscore'.
+    :return: The Normalized Scores.
+    '''
+    scores = np.asarray(scores, dtype = np.float64)
+    if normalization == 'rank':
+        ordered = np.sort(scores)
+        lower = np.searchsorted(ordered, scores, side = 'left')
+        upper = np.searchsorted(ordered, scores, side = 'right')
+        return (lower + upper - 1) / 2.0 / max(scores.shape[0] - 1, 1)
+    if normalization == 'zscore':
+        spread = np.std(scores)
+        return (scores - np.mean(scores)) / spread if spread > 0 else np.zeros_like(scores)
+    print('%s is not a Valid Score Normalization.' % normalization)
+    sys.exit(errno.EINVAL)
 
 # Class Declaration
 class AnomalyDetector:
@@ -28,10 +55,9 @@ class AnomalyDetector:
         The Default Constructor.
         '''
         self.config = config
-        self.M = {'methane_mixing_ratio_bias_corrected': np.array([1,2,3,4,5]),
-                  'latitude': np.array([1,2,3,4,5]),
-                  'longitude': np.array([1,2,3,4,5])}
-        self.y = self.M[self.config['model']['response']]
+        self.M = M
+        self.y = np.asarray(self.M[self.config['model']['response']][:])
+        self.validation = None
 
     def plotAnomalyScores(self, anomalyScores):
         '''
@@ -40,6 +66,7 @@ class AnomalyDetector:
         Plot should be Used as a Reference for Selecting the `anomalyScoreCutoff`
         Hyperparameter for this Method.
         '''
+        import matplotlib.pyplot as plt
         plt.hist(anomalyScores, bins = 'auto')
         plt.title('Distribution of Autoencoder Anomaly Scores (Higher -> More Unusual)')
         plt.savefig(os.path.join('software/analyze/static/images', 'anomalyScoresPlot.png'))
@@ -50,37 +77,62 @@ class AnomalyDetector:
 
         Return the Reduced Data and the Indices of the Reduced Data in the Original Data.
         '''
-        # Calculate the Sample Spread Statistic
-        if spreadStatistic == 'IQR':
-            ySpread = np.quantile(self.y, 0.75) - np.quantile(self.y, 0.25)
-        elif spreadStatistic == 'StandardDeviation':
-            ySpread = numpy.std(self.y)
-        elif spreadStatistic == 'MAD':
-            ySpread = np.mean(np.absolute(self.y - mean(self.y)))
-        else:
-            print('No Valid Spread Statistic Selected')
-            sys.exit(errno.EINVAL)
+        with metrics.stage('removeCommonData', rows = self.y.shape[0]):
+            # Calculate the Sample Spread Statistic
+            if spreadStatistic == 'IQR':
+                ySpread = np.quantile(self.y, 0.75) - np.quantile(self.y, 0.25)
+            elif spreadStatistic == 'StandardDeviation':
+                ySpread = np.std(self.y)
+            elif spreadStatistic == 'MAD':
+                ySpread = np.mean(np.absolute(self.y - np.mean(self.y)))
+            else:
+                print('No Valid Spread Statistic Selected')
+                sys.exit(errno.EINVAL)
 
-        # Kill Data that are within 1 `spreadStatistic` of the Mean
-        yMean = np.mean(self.y)
-        yStar = []
-        idxList = []
-        for idx in range(self.y.shape[0]):
-            if np.abs(self.y[idx] - yMean) >= (threshold * ySpread):
-                yStar.append(self.y[idx])
-                idxList.append(idx)
-        return yStar, idxList
+            # Kill Data that are within 1 `spreadStatistic` of the Mean
+            yMean = np.mean(self.y)
+            idxList = np.flatnonzero(np.abs(self.y - yMean) >= (threshold * ySpread))
+            return self.y[idxList], idxList
 
-    def detectWithLocalOutlierFactor(self):
+    def rankAnomalies(self, idxList, isAnomaly, scores, descending = False, details = None):
         '''
-        Apply the Local Outlier Factor.
+        Order the Flagged Observations from Most to Least Anomalous.
+
+        :param idxList: The Indices of the Scored Observations in the Data Matrix.
+        :param isAnomaly: A Boolean Array Flagging the Anomalous Scored Observations.
+        :param scores: The Anomaly Score of Every Scored Observation.
+        :param descending: Whether Higher Scores are More Anomalous.
+        :param details: A Map of Names to Per-Observation Scores to Report with
+                        Each Anomaly (or None).
+        :return: A List of (lon, lat) Tuples, Most Anomalous First; with `details`,
+                 (lon, lat, {name: score}) Tuples.
         '''
-        # Find Model Hyperparameters
-        hpMap = self.config['AnomalyDetector']['LocalOutlierFactorHyperparameters']
+        with metrics.stage('rankAnomalies', rows = len(scores)):
+            flagged = np.flatnonzero(isAnomaly)
+            order = np.argsort(-scores[flagged] if descending else scores[flagged], kind = 'stable')
+            anomalyIdxList = np.asarray(idxList)[flagged[order]]
+            lon = np.asarray(self.M['longitude'][:])[anomalyIdxList]
+            lat = np.asarray(self.M['latitude'][:])[anomalyIdxList]
+            if details is None:
+                return list(zip(lon.tolist(), lat.tolist()))
+            ranked = {name: np.asarray(values)[flagged[order]].tolist() for name, values in details.items()}
+            return [(x, y, {name: ranked[name][i] for name in ranked})
+                    for i, (x, y) in enumerate(zip(lon.tolist(), lat.tolist()))]
 
-        # Get the Thresholded Response
-        yStar, idxList = self.removeCommonData(hpMap['spreadStatistic'], hpMap['threshold'])
-        yStar = [[elem] for elem in yStar]
+    def scoreWithLocalOutlierFactor(self, X, hpMap):
+        '''
+        Score Observations with the Local Outlier Factor, with scikit-learn's
+        Exact Neighbours or an Approximate Neighbour Index (`neighborIndex`).
+
+        :param X: The (n x 1) Thresholded Response.
+        :param hpMap: The Local Outlier Factor Hyperparameters.
+        :return: A Boolean Array Flagging Anomalies, and the Local Outlier
+                 Factors (Higher is More Anomalous).
+        '''
+        neighborIndex = hpMap.get('neighborIndex')
+        if neighborIndex is not None and neighborIndex != 'exact':
+            return self.scoreWithApproximateLocalOutlierFactor(X, hpMap)
+        from sklearn.neighbors import LocalOutlierFactor
 
         # Instantiate the Local Outlier Factor
         LOF = LocalOutlierFactor(n_neighbors = hpMap['numNeighbors'],
@@ -90,19 +142,94 @@ class AnomalyDetector:
                                  p = hpMap['p'])
 
         # Fit and Predict with the Local Outlier Factor
-        predictions = LOF.fit_predict(yStar)
-        scores = LOF.negative_outlier_factor_
+        with metrics.stage('fitLocalOutlierFactor', rows = X.shape[0]):
+            predictions = LOF.fit_predict(X)
+            return predictions == -1, -LOF.negative_outlier_factor_
+
+    def scoreWithApproximateLocalOutlierFactor(self, X, hpMap):
+        '''
+        Score Observations with the Local Outlier Factor on the k-Neighbour Graph
+        of an Approximate Neighbour Index, and Report its Accuracy against Exact
+        Neighbours on a Sample of `validationSample` Rows (if Set).
+
+        :param X: The (n x 1) Thresholded Response.
+        :param hpMap: The Local Outlier Factor Hyperparameters.
+        :return: A Boolean Array Flagging Anomalies, and the Local Outlier Factors.
+        '''
+        from software.analyze import neighbors
+        if X.shape[0] < 2:
+            return np.zeros(X.shape[0], dtype = bool), np.ones(X.shape[0])
+        numNeighbors = min(hpMap['numNeighbors'], X.shape[0] - 1)
+
+        # Build the Index, Find the Neighbour Graph, and Score
+        with metrics.stage('fitLocalOutlierFactor', rows = X.shape[0]):
+            index = neighbors.getIndex(hpMap['neighborIndex'], X, hpMap)
+            distances, indices = index.query(numNeighbors)
+            outlierFactor = neighbors.localOutlierFactor(distances, indices)
+        if hpMap.get('validationSample'):
+            with metrics.stage('validateLocalOutlierFactor', rows = hpMap['validationSample']):
+                self.validation = neighbors.validate(X, distances, indices, hpMap['neighborIndex'], hpMap,
+                                                     hpMap['validationSample'], outlierFactor = outlierFactor)
+            logger.info('Approximate LOF Accuracy: %s' % self.validation)
+        return outlierFactor > neighbors.OUTLIER_FACTOR_CUTOFF, outlierFactor
+
+    def scoreWithIsolationForest(self, X, hpMap):
+        '''
+        Score Observations with the Isolation Forest.
+
+        :param X: The (n x 1) Thresholded Response.
+        :param hpMap: The Isolation Forest Hyperparameters.
+        :return: A Boolean Array Flagging Anomalies, and the Anomaly Scores
+                 (Higher is More Anomalous).
+        '''
+        from sklearn.ensemble import IsolationForest
+
+        # Instantiate the Isolation Forest
+        ISO = IsolationForest(n_estimators = hpMap['numEstimators'],
+                              bootstrap = hpMap['bootstrap'])
+
+        # Fit and Predict with the Isolation Forest
+        with metrics.stage('fitIsolationForest', rows = X.shape[0]):
+            predictions = ISO.fit_predict(X)
+            return predictions == -1, -ISO.decision_function(X)
+
+    def scoreWithAutoencoder(self, X, hpMap):
+        '''
+        Score Observations with the Autoencoder.
+
+        :param X: The (n x 1) Response.
+        :param hpMap: The Autoencoder Hyperparameters.
+        :return: A Boolean Array Flagging Anomalies, and the Anomaly Scores
+                 (Higher is More Anomalous).
+        '''
+        from pyod.models.auto_encoder import AutoEncoder
+
+        # Create and Fit the Autoencoder Model
+        AE = AutoEncoder(hidden_neurons = [1 for i in range(hpMap['depth'])])
+        with metrics.stage('fitAutoencoder', rows = X.shape[0]):
+            AE.fit(X)
+
+        # Get & Plot Anomaly Scores for the Observations
+        anomalyScores = AE.decision_scores_
+        if hpMap.get('plotScores', True):
+            self.plotAnomalyScores(anomalyScores)
+        return anomalyScores >= hpMap['anomalyScoreCutoff'], anomalyScores
+
+    def detectWithLocalOutlierFactor(self):
+        '''
+        Apply the Local Outlier Factor.
+        '''
+        # Find Model Hyperparameters
+        hpMap = self.config['AnomalyDetector']['LocalOutlierFactorHyperparameters']
+
+        # Get the Thresholded Response
+        yStar, idxList = self.removeCommonData(hpMap['spreadStatistic'], hpMap['threshold'])
+        isAnomaly, scores = self.scoreWithLocalOutlierFactor(yStar.reshape(-1, 1), hpMap)
 
         # Report the Lon/Lat Points Corresponding to the Anomalies
         # in the Order of Decreasing Local Outlier Factor (i.e., the
         # Most Anomalous Points are Shown First)
-        anomalyIdxList = [idxList[i] for i in range(len(yStar)) if predictions[i] == -1]
-        anomalyLonLatMap = {scores[i]: (self.M['longitude'][idx], self.M['latitude'][idx]) \
-                            for idx in anomalyIdxList}
-        sortedScores = sorted(scores)
-        anomaliesLonLatSorted = [anomalyLonLatMap[sortedScores[i]] for i in range(len(sortedScores)) \
-                                 if sortedScores[i] in anomalyLonLatMap]
-        return anomaliesLonLatSorted
+        return self.rankAnomalies(idxList, isAnomaly, scores, descending = True)
 
     def detectWithIsolationForest(self):
         '''
@@ -113,26 +240,12 @@ class AnomalyDetector:
 
         # Get the Thresholded Response
         yStar, idxList = self.removeCommonData(hpMap['spreadStatistic'], hpMap['threshold'])
-        yStar = [[elem] for elem in yStar]
-
-        # Instantiate the Local Outlier Factor
-        ISO = IsolationForest(n_estimators = hpMap['numEstimators'],
-                              bootstrap = hpMap['bootstrap'])
-
-        # Fit and Predict with the Local Outlier Factor
-        predictions = ISO.fit_predict(yStar)
-        scores = ISO.decision_function(yStar)
+        isAnomaly, scores = self.scoreWithIsolationForest(yStar.reshape(-1, 1), hpMap)
 
         # Report the Lon/Lat Points Corresponding to the Anomalies
         # in the Order of Decreasing Anomaly Score (i.e., the Most
         # Anomalous Points are Shown First)
-        anomalyIdxList = [idxList[i] for i in range(len(yStar)) if predictions[i] == -1]
-        anomalyLonLatMap = {scores[i]: (self.M['longitude'][idx], self.M['latitude'][idx]) \
-                            for idx in anomalyIdxList}
-        sortedScores = sorted(scores)
-        anomaliesLonLatSorted = [anomalyLonLatMap[sortedScores[i]] for i in range(len(sortedScores)) \
-                                 if sortedScores[i] in anomalyLonLatMap]
-        return anomaliesLonLatSorted
+        return self.rankAnomalies(idxList, isAnomaly, scores, descending = True)
 
     def detectWithAutoencoder(self):
         '''
@@ -140,33 +253,71 @@ class AnomalyDetector:
         '''
         # Find Model Hyperparameters
         hpMap = self.config['AnomalyDetector']['AutoencoderHyperparameters']
-
-        # Create and Fit the Autoencoder Model
-        AE = AutoEncoder(hidden_neurons = [1 for i in range(hpMap['depth'])])
-        AE.fit(self.y.reshape(-1, 1))
-
-        # Get & Plot Anomaly Scores for the Observations
-        anomalyScores = AE.decision_scores_
-        self.plotAnomalyScores(anomalyScores)
+        isAnomaly, scores = self.scoreWithAutoencoder(self.y.reshape(-1, 1), hpMap)
 
         # Report the Lon/Lat Points Corresponding to the Anomalies
         # in the Order of Decreasing Anomaly Score (i.e., the Most
         # Anomalous Points are Shown First)
-        anomalyIdxList = [self.y[i] for i in range(self.y.shape[0]) \
-                          if anomalyScores[i] >= hpMap['anomalyScoreCutoff']]
-        anomalyLonLatMap = {anomalyScores[i]: (self.M['longitude'][idx], self.M['latitude'][idx]) \
-                            for idx in anomalyIdxList}
-        sortedScores = sorted(anomalyScores)
-        anomaliesLonLatSorted = [anomalyLonLatMap[sortedScores[i]] for i in range(len(sortedScores)) \
-                                 if sortedScores[i] in anomalyLonLatMap]
-        return anomaliesLonLatSorted
+        return self.rankAnomalies(np.arange(self.y.shape[0]), isAnomaly, scores, descending = True)
+
+    def detectWithEnsemble(self):
+        '''
+        Run Several Detection Methods Concurrently on One Thresholded Response,
+        Normalize their Scores to a Common Scale, and Rank the Observations
+        Flagged by at Least `minVotes` Methods by their Mean Normalized Score.
+        The Autoencoder Fits the Full Response (as it Does Alone), and its Scores
+        are Read at the Thresholded Observations.
+        '''
+        # Find Model Hyperparameters
+        hpMap = self.config['AnomalyDetector'].get('EnsembleHyperparameters') or {}
+        methods = hpMap.get('methods') or []
+        if len(methods) == 0:
+            print('No Ensemble Methods are Configured.')
+            sys.exit(errno.EINVAL)
+        for method in methods:
+            if method not in SCORERS:
+                print('%s is not a Valid Ensemble Method.' % method)
+                sys.exit(errno.EINVAL)
+
+        # Get the Thresholded Response Once for Every Method
+        yStar, idxList = self.removeCommonData(hpMap.get('spreadStatistic', 'IQR'), hpMap.get('threshold', 1))
+        X = yStar.reshape(-1, 1)
+        if X.shape[0] < 2:
+            return []
+
+        # Score with Every Method in a Thread Pool (the Fits Share X without
+        # Copying it, and the Numerical Work Releases the GIL)
+        futures = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers = hpMap.get('workers') or len(methods)) as pool:
+            for method in methods:
+                scorer, hpName = SCORERS[method]
+                methodMap = dict(self.config['AnomalyDetector'][hpName], plotScores = False)
+                data = self.y.reshape(-1, 1) if method == 'Autoencoder' else X
+                futures[method] = pool.submit(getattr(self, scorer), data, methodMap)
+            outputs = {method: futures[method].result() for method in methods}
+            if 'Autoencoder' in outputs:
+                outputs['Autoencoder'] = tuple(values[idxList] for values in outputs['Autoencoder'])
+
+        # Combine the Normalized Scores and the Votes
+        with metrics.stage('combineEnsemble', rows = X.shape[0]):
+            normalization = hpMap.get('normalization', 'rank')
+            details = {method: normalizeScores(outputs[method][1], normalization) for method in methods}
+            consensus = np.mean([details[method] for method in methods], axis = 0)
+            votes = np.sum([outputs[method][0] for method in methods], axis = 0)
+            details = dict(consensus = consensus, **details)
+
+        # Report the Lon/Lat Points Corresponding to the Anomalies, with the
+        # Consensus and Per-Method Scores, in the Order of Decreasing Consensus
+        return self.rankAnomalies(idxList, votes >= hpMap.get('minVotes', 1), consensus,
+                                  descending = True, details = details)
 
     def detectAnomalies(self):
         '''
         Fit the Anomaly Detection Model of Choice to the Data. Return Anomalies as a List
         of Lat/Lon Center Points.
 
-        :return: A 1D Vector of Tuples Storing (lon, lat) Center Points for Anomalies.
+        :return: A 1D Vector of Tuples Storing (lon, lat) Center Points for Anomalies
+                 (Followed by a Map of Consensus and Per-Method Scores for an Ensemble).
         '''
         method = self.config['AnomalyDetector']['method']
         if method == 'Local Outlier Factor':
@@ -175,6 +326,8 @@ class AnomalyDetector:
             anomalies = self.detectWithIsolationForest()
         elif method == 'Autoencoder':
             anomalies = self.detectWithAutoencoder()
+        elif method == 'Ensemble':
+            anomalies = self.detectWithEnsemble()
         else:
             print('%s is not a Valid Detection Method.' % method)
             sys.exit(errno.EINVAL)
@@ -6,8 +6,12 @@ Implement the Methane Analytic Engine.
 # System Functions
 import sys
 import errno
+import logging
 import numpy as np
+import datetime as dt
+from software import metrics
 from software.analyze.AnomalyDetector import AnomalyDetector
+logger = logging.getLogger(__name__)
 
 # Helper Functions
 def _dateToTime(dateString):
@@ -20,6 +24,23 @@ def _dateToTime(dateString):
     dateStringDT = dt.datetime.strptime(dateString, '%Y-%m-%d')
     return (dateStringDT - dt.datetime(2010, 1, 1)).total_seconds()
 
+def _applyMask(M, mask, numRows):
+    '''
+    Keep the Rows Selected by a Boolean Mask in Every Per-Row Variable.
+
+    :param M: The Data Matrix.
+    :param mask: A Boolean Array with One Entry per Row.
+    :param numRows: The Number of Rows in the Data Matrix.
+    :return: The Data Matrix with Only the Selected Rows.
+    '''
+    newM = {}
+    for key in M:
+        if M[key].shape[0] == numRows:
+            newM[key] = np.asarray(M[key][:])[mask]
+        else:
+            newM[key] = M[key][:]
+    return newM
+
 def chooseAnalytic(analytic, config):
     '''
     Routes the Analytic Run toward the Selected Feature.
@@ -37,6 +58,9 @@ def chooseAnalytic(analytic, config):
     elif analytic == 'Autoencoder':
         config['AnomalyDetector']['method'] = analytic
         return config
+    elif analytic == 'Ensemble':
+        config['AnomalyDetector']['method'] = analytic
+        return config
     else:
         print('\nError : No Valid Analytic Selected.\n')
         sys.exit(errno.EINVAL)
@@ -51,16 +75,22 @@ def enforceBoundingBox(M, latBox, lonBox):
     :param lonBox: The Bounding Longitudes.
     :return: The Data Matrix with Only Data Inside the Bounding Box.
     '''
-    indicesToKeep = [i for i in range(M['latitude'].shape[0]) \
-                     if latBox[0] <= M['latitude'][i] and latBox[1] >= M['latitude'][i] \
-                     and lonBox[0] <= M['longitude'][i] and lonBox[1] >= M['longitude'][i]]
-    newM = {}
-    for key in M:
-        if M[key].shape[0] == M['latitude'].shape[0]:
-            newM[key] = np.array([M[key][i] for i in indicesToKeep])
-        else:
-            newM[key] = M[key]
-    return newM
+    lat = np.asarray(M['latitude'][:])
+    lon = np.asarray(M['longitude'][:])
+    mask = (latBox[0] <= lat) & (latBox[1] >= lat) & (lonBox[0] <= lon) & (lonBox[1] >= lon)
+    return _applyMask(M, mask, lat.shape[0])
+
+def enforceRegion(M, region):
+    '''
+    Removes Records from the Data Matrix that Fall Outside a Polygon Region.
+
+    :param M: The Data Matrix.
+    :param region: The `geometry.PolygonRegion`.
+    :return: The Data Matrix with Only Data Inside the Region.
+    '''
+    lat = np.asarray(M['latitude'][:])
+    mask = region.contains(lat, np.asarray(M['longitude'][:]))
+    return _applyMask(M, mask, lat.shape[0])
 
 def enforceDateFilter(M, startDate, endDate):
     '''
@@ -78,16 +108,11 @@ def enforceDateFilter(M, startDate, endDate):
         endTime = _dateToTime(endDate)
     except:
         endTime = 1e20
-    indicesToKeep = [i for i in range(M['time'].shape[0]) if i >= startTime and i <= endTime]
-    newM = {}
-    for key in M:
-        if M[key].shape[0] == M['time'].shape[0]:
-            newM[key] = np.array([M[key][:][i] for i in indicesToKeep])
-        else:
-            newM[key] = M[key][:]
-    return newM
+    time = np.asarray(M['time'][:])
+    mask = (time >= startTime) & (time <= endTime)
+    return _applyMask(M, mask, time.shape[0])
 
-def runAnalytic(M, analytic, config, latBox, lonBox, startDate, endDate):
+def runAnalytic(M, analytic, config, latBox, lonBox, startDate, endDate, region = None):
     '''
     Runs the Selected Analytic and Returns Valid Results.
 
@@ -95,16 +120,23 @@ def runAnalytic(M, analytic, config, latBox, lonBox, startDate, endDate):
     :param analytic: The Full Name of the Selected Analytic.
     :param latBox: The Bounding Box for Latitude.
     :param lonBox: The Bounding Box for Longitude.
+    :param region: A `geometry.PolygonRegion` to Restrict the Data To (or None).
     :return: Results of the Selected Analytic.
     '''
     # Choose an Analytic and Enforce the Bounding Box
     if latBox is not None and lonBox is not None:
-        M = enforceBoundingBox(M, latBox, lonBox)
+        with metrics.stage('enforceBoundingBox', rows = M['latitude'].shape[0]):
+            M = enforceBoundingBox(M, latBox, lonBox)
+    if region is not None:
+        with metrics.stage('enforceRegion', rows = M['latitude'].shape[0]):
+            M = enforceRegion(M, region)
     if startDate is not None and endDate is not None:
-        M = enforceDateFilter(M, startDate, endDate)
+        with metrics.stage('enforceDateFilter', rows = M['time'].shape[0]):
+            M = enforceDateFilter(M, startDate, endDate)
     AD = AnomalyDetector(chooseAnalytic(analytic, config), M)
 
     # Run the Chosen Analytic with the Bounded Data
-    results = AD.detectAnomalies()
-    print(results)
+    with metrics.stage('detectAnomalies', rows = M['latitude'].shape[0]):
+        results = AD.detectAnomalies()
+    logger.debug('Analytic Results: %s' % results)
     return results
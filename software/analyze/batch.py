@@ -0,0 +1,220 @@
+#! /usr/bin/python3.6
+'''
+Run the Methane Analytic Headlessly over a List of (Region, Date Window, Method)
+Jobs, without the Web Service or any Image Rendering.
+'''
+
+# System Functions
+import os
+import sys
+import csv
+import copy
+import json
+import errno
+import logging
+import multiprocessing
+import yaml
+import numpy as np
+from software import geometry
+from software.analyze import analyzer
+logger = logging.getLogger(__name__)
+
+# Supported Output Formats
+FORMATS = ('csv', 'parquet', 'ndjson')
+COLUMNS = ['job', 'method', 'rank', 'longitude', 'latitude']
+
+class SpatialIndex:
+    '''
+    Sort the Data Matrix by Latitude Once, so Each Bounding Box Query is a
+    Binary Search for the Latitude Band plus a Longitude Mask over that Band.
+    '''
+    def __init__(self, M):
+        '''
+        The Default Constructor.
+        '''
+        lat = np.asarray(M['latitude'][:])
+        self.numRows = lat.shape[0]
+        order = np.argsort(lat, kind = 'stable')
+        self.M = {}
+        for key in M:
+            values = np.asarray(M[key][:])
+            if values.ndim > 0 and values.shape[0] == self.numRows:
+                self.M[key] = values[order]
+            else:
+                self.M[key] = values
+        self.lat = self.M['latitude']
+        self.lon = self.M['longitude']
+
+    def select(self, latBox, lonBox, region = None):
+        '''
+        Get the Rows Inside a Lat/Lon Bounding Box (and Polygon Region).
+
+        :param latBox: The Bounding Latitudes (or None for All).
+        :param lonBox: The Bounding Longitudes (or None for All).
+        :param region: A `geometry.PolygonRegion` (or None for All).
+        :return: The Data Matrix with Only Data Inside the Bounding Box.
+        '''
+        lower, upper = 0, self.numRows
+        if latBox is not None:
+            lower = np.searchsorted(self.lat, latBox[0], side = 'left')
+            upper = np.searchsorted(self.lat, latBox[1], side = 'right')
+        if region is not None:
+            lower = max(lower, np.searchsorted(self.lat, region.latBox[0], side = 'left'))
+            upper = max(lower, min(upper, np.searchsorted(self.lat, region.latBox[1], side = 'right')))
+        band = slice(lower, upper)
+        if lonBox is not None or region is not None:
+            lon = self.lon[band]
+            mask = np.ones(lon.shape[0], dtype = bool)
+            if lonBox is not None:
+                mask &= (lonBox[0] <= lon) & (lonBox[1] >= lon)
+            if region is not None:
+                mask &= region.contains(self.lat[band], lon, latSorted = True)
+        else:
+            mask = slice(None)
+        newM = {}
+        for key in self.M:
+            if self.M[key].ndim > 0 and self.M[key].shape[0] == self.numRows:
+                newM[key] = self.M[key][band][mask]
+            else:
+                newM[key] = self.M[key]
+        return newM
+
+def loadJobs(fileName):
+    '''
+    Read the Batch Jobs from a YAML File. Each Job Names a Method and, Optionally,
+    a `latBox`, `lonBox`, `geojson` Polygon Region, `startDate`, `endDate`, and
+    the `methods` of an 'Ensemble' Job.
+
+    :param fileName: The Path to the Jobs YAML File.
+    :return: The Parsed Batch Settings with a Normalized List of Jobs.
+    '''
+    with open(fileName, 'r') as ymlFile:
+        batch = yaml.load(ymlFile, yaml.SafeLoader)
+    jobs = []
+    for i, job in enumerate(batch['jobs']):
+        jobs.append({'name': job.get('name', 'job%d' % (i + 1)),
+                     'method': job['method'],
+                     'methods': job.get('methods'),
+                     'latBox': tuple(sorted(job['latBox'])) if job.get('latBox') else None,
+                     'lonBox': tuple(sorted(job['lonBox'])) if job.get('lonBox') else None,
+                     'region': geometry.PolygonRegion(job['geojson']) if job.get('geojson') else None,
+                     'startDate': job.get('startDate'),
+                     'endDate': job.get('endDate')})
+    batch['jobs'] = jobs
+    return batch
+
+# Shared State for Worker Processes (Set Once per Worker, or Inherited on Fork)
+_SHARED = {}
+
+def _initWorker(index, config):
+    _SHARED['index'] = index
+    _SHARED['config'] = config
+
+def _runJob(job):
+    '''
+    Run One Job against the Shared Spatial Index.
+
+    :param job: The Job Dictionary.
+    :return: A List of Result Rows for the Job.
+    '''
+    config = copy.deepcopy(_SHARED['config'])
+    config['AnomalyDetector']['AutoencoderHyperparameters']['plotScores'] = False
+    if job.get('methods'):
+        config['AnomalyDetector'].setdefault('EnsembleHyperparameters', {})['methods'] = job['methods']
+    M = _SHARED['index'].select(job['latBox'], job['lonBox'], job.get('region'))
+    if job['startDate'] is not None and job['endDate'] is not None:
+        M = analyzer.enforceDateFilter(M, job['startDate'], job['endDate'])
+    if M['latitude'].shape[0] == 0:
+        logger.warning('Job %s has No Data in its Region and Date Window' % job['name'])
+        return []
+    logger.info('Running Job %s (%s) on %d Rows' % (job['name'], job['method'], M['latitude'].shape[0]))
+    results = analyzer.runAnalytic(M, job['method'], config, None, None, None, None)
+    rows = []
+    for rank in sorted(results):
+        row = {'job': job['name'],
+               'method': job['method'],
+               'rank': rank,
+               'longitude': float(results[rank][0]),
+               'latitude': float(results[rank][1])}
+
+        # Ensemble Jobs also Report the Consensus and Per-Method Scores
+        if len(results[rank]) > 2:
+            row.update(('%s score' % name, float(score)) for name, score in results[rank][2].items())
+        rows.append(row)
+    return rows
+
+def runJobs(M, config, jobs, workers = None):
+    '''
+    Run Every Job over One Shared Data Load and Spatial Index, in Parallel
+    across Processes.
+
+    :param M: The Data Matrix.
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :param jobs: The List of Job Dictionaries.
+    :param workers: The Number of Worker Processes (Defaults to the CPU Count).
+    :return: A List of Result Rows for All Jobs, in Job Order.
+    '''
+    index = SpatialIndex(M)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        _initWorker(index, config)
+        rowsPerJob = [_runJob(job) for job in jobs]
+    else:
+        # Forked Workers Inherit the Index without Copying it through a Pipe
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with context.Pool(workers, initializer = _initWorker, initargs = (index, config)) as pool:
+            rowsPerJob = pool.map(_runJob, jobs, chunksize = 1)
+    return [row for rows in rowsPerJob for row in rows]
+
+def getFormat(outFile, outFormat = None, default = 'csv'):
+    '''
+    Pick the Output Format from an Explicit Choice, else the Outfile Extension,
+    else a Default.
+
+    :param outFile: The Open Output File.
+    :param outFormat: The Explicitly Requested Format (or None).
+    :param default: The Format to Use if Neither Decides.
+    :return: One of `FORMATS`.
+    '''
+    if outFormat is not None:
+        return outFormat
+    extension = os.path.splitext(getattr(outFile, 'name', ''))[1].lower()
+    return {'.csv': 'csv', '.parquet': 'parquet', '.ndjson': 'ndjson',
+            '.jsonl': 'ndjson'}.get(extension, default or 'csv')
+
+def writeResults(rows, outFile, outFormat):
+    '''
+    Write the Batch Results to the Outfile.
+
+    :param rows: The List of Result Rows.
+    :param outFile: The Open (Text) Output File.
+    :param outFormat: One of `FORMATS`.
+    '''
+    columns = COLUMNS + sorted(set(c for row in rows for c in row if c not in COLUMNS))
+    if outFormat == 'csv':
+        writer = csv.DictWriter(outFile, fieldnames = columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    elif outFormat == 'ndjson':
+        for row in rows:
+            outFile.write(json.dumps(row) + '\n')
+    elif outFormat == 'parquet':
+        # Parquet is Written by Path, so the Outfile Must be a Named File (Not
+        # Standard Output, even once Batch Mode has Pointed `sys.stdout` Elsewhere)
+        name = getattr(outFile, 'name', None)
+        if outFile in (sys.stdout, sys.__stdout__) or not isinstance(name, str) or name.startswith('<'):
+            print('ERROR : Parquet Output Requires an --outfile.')
+            sys.exit(errno.EINVAL)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            print('ERROR : Parquet Output Requires pyarrow.')
+            sys.exit(errno.EINVAL)
+        table = pa.table({c: [row.get(c) for row in rows] for c in columns})
+        outFile.close()
+        pq.write_table(table, outFile.name)
+    else:
+        print('ERROR : %s is not a Valid Output Format.' % outFormat)
+        sys.exit(errno.EINVAL)
@@ -0,0 +1,266 @@
+#! /usr/bin/python3.6
+'''
+Approximate k-Nearest-Neighbour Indexes and a Vectorized Local Outlier Factor
+Computed from their k-Neighbour Graph, plus an Accuracy Report against Exact
+Neighbours on a Validation Sample.
+
+An Index is Built from the (n x d) Data and Answers `query(k)` with the (n x k)
+Distances and Indices of Each Row's k Nearest Other Rows, Nearest First. New
+Backends are Added to `INDEXES`.
+'''
+
+# Data-Related Functions
+import numpy as np
+
+# Points with a Local Outlier Factor above this are Outliers (scikit-learn's
+# Cutoff when `contamination = 'auto'`)
+OUTLIER_FACTOR_CUTOFF = 1.5
+
+# Candidate Distances Computed at Once (Bounds the Memory of a Query Block)
+BLOCK_ELEMENTS = 2 ** 20
+
+def getMinkowskiP(metric, p = 2):
+    '''
+    Get the Minkowski Power of a Distance Metric.
+
+    :param metric: 'manhattan', 'euclidean', or 'minkowski'.
+    :param p: The Power for 'minkowski'.
+    :return: The Minkowski Power.
+    '''
+    if metric == 'manhattan':
+        return 1
+    if metric == 'euclidean':
+        return 2
+    if metric == 'minkowski':
+        return p
+    raise ValueError('%s is not a Supported Neighbour Metric.' % metric)
+
+def _keepNearest(X, rows, candidates, k, p):
+    '''
+    Keep the k Nearest Distinct Candidates of Each Row (Other than the Row Itself).
+
+    :param X: The (n x d) Data.
+    :param rows: The Indices of the Rows to Query.
+    :param candidates: A (Rows x c) Array of Candidate Row Indices (May Repeat).
+    :param k: The Number of Neighbours.
+    :param p: The Minkowski Power.
+    :return: The (Rows x k) Distances and Indices, Nearest First.
+    '''
+    block = np.sort(candidates, axis = 1)
+    diff = np.abs(X[block] - X[rows, None, :])
+    d = np.sum(diff ** p, axis = 2) ** (1.0 / p) if p != 1 else np.sum(diff, axis = 2)
+
+    # Rule Out the Row Itself and Repeated Candidates
+    invalid = block == rows[:, None]
+    invalid[:, 1:] |= block[:, 1:] == block[:, :-1]
+    d[invalid] = np.inf
+
+    nearest = np.argpartition(d, k - 1, axis = 1)[:, :k]
+    nearestD = np.take_along_axis(d, nearest, axis = 1)
+    order = np.argsort(nearestD, axis = 1, kind = 'stable')
+    return np.take_along_axis(nearestD, order, axis = 1), \
+           np.take_along_axis(np.take_along_axis(block, nearest, axis = 1), order, axis = 1)
+
+class ProjectionIndex:
+    '''
+    A Random-Projection Index: the Data are Sorted along a Few Random Directions,
+    and Each Row's Candidates are the Rows within `window` Sort Positions of it
+    along Any Direction. Only Candidates have their True Distance Computed. Each
+    Refinement Pass then Re-Selects from the Neighbours' Neighbours (One Step of
+    NN-Descent on the k-Neighbour Graph).
+
+    For One-Dimensional Data (Such as the Thresholded Response), the Sort Order
+    is the Data Order, so the k Nearest are Always within k Positions and a
+    `window` of at Least k Makes the Index Exact without Refinement.
+    '''
+    def __init__(self, X, numProjections = 8, window = 32, numRefinements = 1, metric = 'euclidean', p = 2,
+                 seed = 0):
+        '''
+        The Default Constructor.
+
+        :param X: The (n x d) Data.
+        :param numProjections: The Number of Random Directions (One for 1D Data).
+        :param window: The Candidate Sort Positions on Each Side of a Row.
+        :param numRefinements: The Neighbours-of-Neighbours Passes (None for 1D Data).
+        :param metric: The Distance Metric (See `getMinkowskiP`).
+        :param p: The Minkowski Power for 'minkowski'.
+        :param seed: The Random Seed for the Directions.
+        '''
+        self.X = np.asarray(X, dtype = np.float64).reshape(len(X), -1)
+        self.window = int(window)
+        self.p = getMinkowskiP(metric, p)
+        self.numRefinements = 0 if self.X.shape[1] == 1 else int(numRefinements)
+        numProjections = 1 if self.X.shape[1] == 1 else int(numProjections)
+        directions = np.random.RandomState(seed).normal(size = (self.X.shape[1], numProjections))
+        directions /= np.linalg.norm(directions, axis = 0)
+        projected = self.X @ directions
+
+        # Each Direction's Sort Order, and Each Row's Position in it
+        self.orders = np.argsort(projected, axis = 0, kind = 'stable').T
+        self.positions = np.empty_like(self.orders)
+        for order, position in zip(self.orders, self.positions):
+            position[order] = np.arange(order.shape[0])
+
+    def query(self, k):
+        '''
+        Find Each Row's k Nearest Other Rows.
+
+        :param k: The Number of Neighbours.
+        :return: The (n x k) Distances and Indices, Nearest First.
+        '''
+        numRows = self.X.shape[0]
+        window = k if self.X.shape[1] == 1 else max(self.window, k)
+        offsets = np.concatenate((np.arange(-window, 0), np.arange(1, window + 1)))
+        distances = np.empty((numRows, k), dtype = np.float64)
+        indices = np.empty((numRows, k), dtype = np.int64)
+
+        # Query in Blocks of Rows to Bound the Candidate Distance Memory
+        numCandidates = offsets.shape[0] * self.orders.shape[0]
+        blockRows = max(1, BLOCK_ELEMENTS // (numCandidates * self.X.shape[1]))
+        for start in range(0, numRows, blockRows):
+            rows = np.arange(start, min(start + blockRows, numRows))
+            candidates = [order[np.clip(position[rows, None] + offsets, 0, numRows - 1)]
+                          for order, position in zip(self.orders, self.positions)]
+            distances[rows], indices[rows] = _keepNearest(self.X, rows, np.hstack(candidates), k, self.p)
+
+        # Refine from the Current Neighbours and their Neighbours
+        blockRows = max(1, BLOCK_ELEMENTS // ((k + k * k) * self.X.shape[1]))
+        for i in range(self.numRefinements):
+            current = indices.copy()
+            for start in range(0, numRows, blockRows):
+                rows = np.arange(start, min(start + blockRows, numRows))
+                candidates = np.hstack((current[rows], current[current[rows]].reshape(rows.shape[0], -1)))
+                distances[rows], indices[rows] = _keepNearest(self.X, rows, candidates, k, self.p)
+        return distances, indices
+
+# Available Approximate Index Backends
+INDEXES = {'projection': ProjectionIndex}
+
+def getIndex(name, X, hpMap):
+    '''
+    Build a Neighbour Index Backend from the LOF Hyperparameters.
+
+    :param name: The Backend Name (a Key of `INDEXES`).
+    :param X: The (n x d) Data.
+    :param hpMap: The Local Outlier Factor Hyperparameters.
+    :return: The Built Index.
+    '''
+    if name not in INDEXES:
+        raise ValueError('%s is not a Valid Neighbour Index.' % name)
+    return INDEXES[name](X,
+                         numProjections = hpMap.get('numProjections', 8),
+                         window = hpMap.get('candidateWindow', 32),
+                         numRefinements = hpMap.get('numRefinements', 1),
+                         metric = hpMap.get('metric', 'euclidean'),
+                         p = hpMap.get('p', 2))
+
+def localOutlierFactor(distances, indices):
+    '''
+    Compute the Local Outlier Factor of Every Row from its k-Neighbour Graph.
+
+    :param distances: The (n x k) Neighbour Distances, Nearest First.
+    :param indices: The (n x k) Neighbour Indices.
+    :return: The Local Outlier Factor of Every Row (Higher is More Anomalous).
+    '''
+    # Reachability Distance to a Neighbour: at Least that Neighbour's k-Distance
+    kDistance = distances[:, -1]
+    reachability = np.maximum(distances, kDistance[indices])
+
+    # Local Reachability Density, and its Ratio to the Neighbours' Densities
+    lrd = 1.0 / (np.mean(reachability, axis = 1) + 1e-10)
+    return np.mean(lrd[indices], axis = 1) / lrd
+
+def _getRanks(values):
+    ranks = np.empty(values.shape[0], dtype = np.float64)
+    ranks[np.argsort(values, kind = 'stable')] = np.arange(values.shape[0])
+    return ranks
+
+def _queryExact(model, X, rows, k):
+    '''
+    Find the Exact k Nearest Other Rows of Some Rows of the Data.
+
+    :param model: A `NearestNeighbors` Fit to All of X.
+    :param X: The (n x d) Data.
+    :param rows: The Indices of the Rows to Query.
+    :param k: The Number of Neighbours.
+    :return: The (Rows x k) Distances and Indices, Nearest First.
+    '''
+    distances, indices = model.kneighbors(X[rows], n_neighbors = k + 1)
+
+    # Drop the Row Itself (or, if Duplicates Pushed it Out, the Farthest Candidate)
+    isSelf = indices == rows[:, None]
+    drop = np.where(isSelf.any(axis = 1), np.argmax(isSelf, axis = 1), k)
+    keep = np.ones(indices.shape, dtype = bool)
+    keep[np.arange(rows.shape[0]), drop] = False
+    return distances[keep].reshape(-1, k), indices[keep].reshape(-1, k)
+
+def _exactOutlierFactor(model, X, rows, k):
+    '''
+    Compute the Exact Local Outlier Factor of Some Rows of the Data, Querying
+    Only the Rows it Depends On (their Neighbours and Neighbours' Neighbours).
+
+    :return: The Exact Local Outlier Factors, and the Rows' Exact Distances and Indices.
+    '''
+    distances, indices = _queryExact(model, X, rows, k)
+    kDistance = np.full(X.shape[0], np.nan)
+    lrd = np.full(X.shape[0], np.nan)
+
+    # Densities are Needed for the Rows and their Neighbours, and those Need
+    # the k-Distances of their Own Neighbours
+    densityRows = np.union1d(rows, indices)
+    densityD, densityI = _queryExact(model, X, densityRows, k)
+    kDistance[densityRows] = densityD[:, -1]
+    missing = np.setdiff1d(np.unique(densityI), densityRows)
+    if missing.shape[0] > 0:
+        kDistance[missing] = _queryExact(model, X, missing, k)[0][:, -1]
+    reachability = np.maximum(densityD, kDistance[densityI])
+    lrd[densityRows] = 1.0 / (np.mean(reachability, axis = 1) + 1e-10)
+    return np.mean(lrd[indices], axis = 1) / lrd[rows], distances, indices
+
+def validate(X, distances, indices, name, hpMap, sampleSize = 10000, seed = 0, outlierFactor = None):
+    '''
+    Compare the k-Neighbour Graph an Approximate Index Found on All the Data
+    (and the Local Outlier Factors from it) against Exact Neighbours over All
+    the Data, at a Random Sample of Rows.
+
+    :param X: The (n x d) Data.
+    :param distances: The (n x k) Approximate Neighbour Distances.
+    :param indices: The (n x k) Approximate Neighbour Indices.
+    :param name: The Index Backend Name.
+    :param hpMap: The Local Outlier Factor Hyperparameters.
+    :param sampleSize: The Number of Rows to Validate On.
+    :param seed: The Random Seed for the Sample.
+    :param outlierFactor: The Approximate Local Outlier Factors (Computed if None).
+    :return: A Dictionary of Accuracy Measures.
+    '''
+    from sklearn.neighbors import NearestNeighbors
+    X = np.asarray(X, dtype = np.float64).reshape(len(X), -1)
+    k = indices.shape[1]
+    rows = np.sort(np.random.RandomState(seed).choice(X.shape[0], min(sampleSize, X.shape[0]), replace = False))
+    if outlierFactor is None:
+        outlierFactor = localOutlierFactor(distances, indices)
+
+    # Exact Neighbours of the Sampled Rows among All the Rows
+    model = NearestNeighbors(metric = 'minkowski',
+                             p = getMinkowskiP(hpMap.get('metric', 'euclidean'), hpMap.get('p', 2))).fit(X)
+    exactLOF, exactD, exactI = _exactOutlierFactor(model, X, rows, k)
+    approxD = distances[rows]
+    approxLOF = outlierFactor[rows]
+
+    # A Found Neighbour is Correct if it is No Farther than the Exact k-th
+    # Neighbour (so Ties at the k-Distance Count)
+    tolerance = 1e-9 * np.maximum(1.0, exactD[:, -1:])
+    recall = np.mean(approxD <= exactD[:, -1:] + tolerance)
+    exactFlags = exactLOF > OUTLIER_FACTOR_CUTOFF
+    approxFlags = approxLOF > OUTLIER_FACTOR_CUTOFF
+    both = np.sum(exactFlags & approxFlags)
+    return {'backend': name,
+            'sampleSize': int(rows.shape[0]),
+            'numNeighbors': int(k),
+            'neighborRecall': float(recall),
+            'kDistanceError': float(np.mean(np.abs(approxD[:, -1] - exactD[:, -1])) / \
+                                    max(np.mean(exactD[:, -1]), 1e-12)),
+            'scoreRankCorrelation': float(np.corrcoef(_getRanks(exactLOF), _getRanks(approxLOF))[0, 1])
+                                    if rows.shape[0] > 1 else 1.0,
+            'flagPrecision': float(both / approxFlags.sum()) if approxFlags.any() else 1.0,
+            'flagRecall': float(both / exactFlags.sum()) if exactFlags.any() else 1.0}
@@ -5,7 +5,9 @@ The REST Service Entry Point for the Methane Analysis Service.
 
 # System Functions
 import os
+import json
 import logging
+import contextlib
 import datetime as dt
 logger = logging.getLogger(__name__)
 
@@ -13,13 +15,13 @@ logger = logging.getLogger(__name__)
 from flask import Flask
 from flask import request
 from flask import render_template
+from flask import Response
 from flask_restful import Api
 from flask_restful import Resource
 
-# WSGI Server Framework from Waitress
-from waitress import serve
-
-# Homemade Data Analytics and Visualizations
+# Homemade Data Analytics, Visualizations, and Instrumentation
+from software import metrics
+from software import geometry
 from software.analyze import analyzer
 from software.visualize import visualizer
 
@@ -56,6 +58,10 @@ class MethaneService(Resource):
         # Initialize Model Matrix
         self.M = M
 
+        # Initialize Stage Instrumentation
+        instrumentation = self.config.get('instrumentation') or {}
+        metrics.traceMemory(instrumentation.get('traceMemory', False))
+
         # Initialize Web Interfaces
         self.app = Flask(__name__)
         self.api = Api(self.app)
@@ -70,6 +76,11 @@ class MethaneService(Resource):
             TEMPLATE_NAME = 'main.html'
             return render_template(TEMPLATE_NAME)
 
+        @self.app.route('/tropomi/metrics')
+        def metricsGET():
+            return Response(metrics.registry.toPrometheus(),
+                            mimetype = 'text/plain; version=0.0.4')
+
         @self.app.route('/tropomi', methods = ['POST'])
         def indexPOST():
             # Extract Entries Supplied to the Webpage
@@ -100,17 +111,42 @@ class MethaneService(Resource):
                 endDate = dt.datetime.now().strftime('%Y-%m-%d')
             latBox = (min(minLat, maxLat), max(minLat, maxLat))
             lonBox = (min(minLon, maxLon), max(minLon, maxLon))
-
-            # Perform Data Analysis
-            results = analyzer.runAnalytic(self.M, analytic, self.config, latBox, lonBox, startDate, endDate)
-            visualization = visualizer.visualizeAnalytic(analytic, results)
+            region = None
+            polygonBox = None
+            if request.form.get('geojson', '').strip() != '':
+                # Parse the Text Only, and Only Accept a GeoJSON Object: a JSON
+                # String Would be Taken as a Path, so Requests Could Probe or
+                # Read Server Files
+                try:
+                    geoJSON = json.loads(request.form['geojson'])
+                    if not isinstance(geoJSON, dict):
+                        raise ValueError('GeoJSON Must be an Object.')
+                    region = geometry.PolygonRegion(geoJSON)
+                except (ValueError, KeyError, TypeError) as ve:
+                    return 'Invalid Polygon Region: %s' % ve, 400
+                polygonBox = 'Lat. (%.3f, %.3f), Lon. (%.3f, %.3f)' % (region.latBox + region.lonBox)
+
+            # Perform Data Analysis (Capturing a cProfile if Requested and Allowed)
+            with contextlib.ExitStack() as stack:
+                if instrumentation.get('allowProfiling', False) and \
+                   (request.args.get('profile') == '1' or request.form.get('profile') == '1'):
+                    stack.enter_context(metrics.profiled(instrumentation.get('profileDir', 'profiles'),
+                                                         label = 'tropomi'))
+                with metrics.stage('tropomiRequest'):
+                    results = analyzer.runAnalytic(self.M, analytic, self.config, latBox, lonBox, startDate, endDate,
+                                                   region = region)
+                    visualization = visualizer.visualizeAnalytic(analytic, results)
 
             # Make Results Readable on the POST
             if results is None:
                 results = {}
             for i in range(5):
                 try:
+                    anomaly = results[(i + 1)]
                     results[(i + 1)] = str(results[(i + 1)][1]) + ' deg Lat.' + ', ' + str(results[(i + 1)][0]) + ' deg Lon.'
+                    if len(anomaly) > 2:
+                        results[(i + 1)] += ' (' + ', '.join('%s %.3f' % (name, score)
+                                                             for name, score in anomaly[2].items()) + ')'
                 except:
                     results[(i + 1)] = 'None'
 
@@ -125,6 +161,7 @@ class MethaneService(Resource):
                                    maxLon = ('%.3f' % maxLon),
                                    startDate = startDate,
                                    endDate = endDate,
+                                   polygonBox = polygonBox,
                                    results = results,
                                    image = IMAGE_PATH)
 
@@ -138,6 +175,7 @@ class MethaneService(Resource):
                          debug = True)
         else:
             logger.info('Running Service with Waitress.')
+            from waitress import serve
             serve(self.app,
                   host = self.config['REST']['host'],
                   port = self.config['REST']['port'])
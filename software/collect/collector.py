@@ -6,18 +6,29 @@ Collects, Formats, and Returns the Collected Data for the Methane Analysis Servi
 # System Functions
 import os
 import sys
+import copy
 import glob
 import errno
 import pdb
 import pickle
 import json
+import struct
 
 # Data-Related Functions
 import numpy as np
 import datetime as dt
-from h5py import File
-from netCDF4 import Dataset
-import rpy2.robjects as R
+from software import geometry
+from software.collect import schema
+from software.collect import storage
+
+# Format Backends (h5py, netCDF4, and the RData Reader) are Imported inside the
+# Loaders that Need Them, so Only the Configured Input Format is Ever Loaded
+
+# Where the Quality Predicate Variables Live in the Orbit NetCDF Files
+QUALITY_PATHS = {'qa_value': u'PRODUCT/qa_value',
+                 'solar_zenith_angle': u'PRODUCT/SUPPORT_DATA/GEOLOCATIONS/solar_zenith_angle',
+                 'viewing_zenith_angle': u'PRODUCT/SUPPORT_DATA/GEOLOCATIONS/viewing_zenith_angle',
+                 'surface_classification': u'PRODUCT/SUPPORT_DATA/INPUT_DATA/surface_classification'}
 
 # Helper Functions
 def _dateToTime(dateString):
@@ -41,16 +52,90 @@ def applyDateFilter(config, M):
     if config['model']['startDate'] is not None and config['model']['endDate'] is not None:
         startTime = _dateToTime(config['model']['startDate'])
         endTime = _dateToTime(config['model']['endDate'])
-        indicesToKeep = [i for i in range(M['time'].shape[0]) if i >= startTime and i <= endTime]
+        time = np.asarray(M['time'][:])
+        toKeep = (time >= startTime) & (time <= endTime)
         newM = {}
         for key in M:
-            if M[key].shape[0] == M['time'].shape[0]:
-                newM[key] = np.array([M[key][:][i] for i in indicesToKeep])
+            if key == storage.INDEX_GROUP:
+                continue
+            values = np.asarray(M[key][:])
+            if values.ndim > 0 and values.shape[0] == time.shape[0]:
+                newM[key] = values[toKeep]
             else:
-                newM[key] = M[key][:]
+                newM[key] = values
         return newM
     else:
-        return {key: M[key][:] for key in M}
+        return {key: np.asarray(M[key][:]) for key in M if key != storage.INDEX_GROUP}
+
+def getQualityMask(config, getVariable, numPixels):
+    '''
+    Evaluate the Configured Quality Predicates (Minimum `qa_value`, Maximum
+    Solar/Viewing Zenith Angles, and Allowed Land/Water Surface Classes) as
+    One Vectorized Mask. Predicates Set to None are Off.
+
+    :param config: The Configuration Dictionary from YAML.
+    :param getVariable: A Callable Returning a Variable's Flat Values in
+                        Physical Units, or None if the Data Lacks it.
+    :param numPixels: The Number of Pixels.
+    :return: A Boolean Mask of the Pixels that Pass, or None if No Predicate is Set.
+    '''
+    minQA = config['model'].get('minQA')
+    maxSolarZenith = config['model'].get('maxSolarZenith')
+    maxViewingZenith = config['model'].get('maxViewingZenith')
+    surfaceClasses = config['model'].get('surfaceClasses')
+    if minQA is None and maxSolarZenith is None and maxViewingZenith is None and surfaceClasses is None:
+        return None
+    keep = np.ones(numPixels, dtype = bool)
+
+    # Fill Values Fall Outside Every Valid Range, so they are Rejected Too
+    if minQA is not None:
+        qa = getVariable('qa_value')
+        if qa is not None:
+            keep &= (qa >= minQA) & (qa <= 1.0)
+    for name, limit in (('solar_zenith_angle', maxSolarZenith), ('viewing_zenith_angle', maxViewingZenith)):
+        if limit is not None:
+            angle = getVariable(name)
+            if angle is not None:
+                keep &= (angle >= 0.0) & (angle <= limit)
+
+    # The Low Two Bits of the Surface Classification are the Land/Water Class
+    # (0 Land, 1 Water, 2 Some Water, 3 Coast); 255 is the Fill Value
+    if surfaceClasses is not None:
+        surface = getVariable('surface_classification')
+        if surface is not None:
+            valid = (surface >= 0) & (surface < 255)
+            landWater = np.where(valid, surface, 0).astype(np.int64) & 3
+            keep &= valid & np.isin(landWater, surfaceClasses)
+    return keep
+
+def applyQualityFilter(config, M):
+    '''
+    Filters Data to the Pixels that Pass the Configured Quality Predicates.
+
+    :param config: The Configuration Dictionary from YAML.
+    :param M: The Model Variable Map.
+    :return: The Data Map of Pixels that Pass.
+    '''
+    numPixels = np.asarray(M['latitude']).shape[0]
+    keep = getQualityMask(config, lambda v: schema.decode(M, v) if v in M else None, numPixels)
+    if keep is None or keep.all():
+        return M
+    return {key: (values[keep] if values.ndim > 0 and values.shape[0] == numPixels else values)
+            for key, values in ((key, np.asarray(M[key])) for key in M)}
+
+def _prepareData(config, M):
+    '''
+    Apply the Quality Filter to Loaded Data and Convert it to the Compact
+    Schema if the Configuration Enables it.
+
+    :param config: The Configuration Dictionary from YAML.
+    :param M: The Model Variable Map.
+    :return: The Data Map in the Configured Schema.
+    '''
+    M = applyQualityFilter(config, M)
+    if schema.isCompact(config):
+        return schema.toCompact(M, config)[0]
+    return M
 
 def getNCs():
     '''
@@ -61,6 +146,105 @@ def getNCs():
     filePath = 'data/'
     return [os.path.join(filePath, f) for f in os.listdir(filePath) if f.endswith('.nc')]
 
+def _readFull(ncFile, name, cache):
+    '''
+    Read a Quality Predicate Variable from an Orbit File Once, Keeping it for
+    the Variable Copy that Follows.
+
+    :param ncFile: The Open Orbit NetCDF File.
+    :param name: The Short Variable Name (a Key of QUALITY_PATHS).
+    :param cache: A Map of Short Variable Names to Flat Values Already Read.
+    :return: The Flat Values, or None if the File Lacks the Variable.
+    '''
+    if name not in cache:
+        try:
+            cache[name] = ncFile[QUALITY_PATHS[name]][:].data[0].flatten()
+        except (KeyError, IndexError) as ke:
+            cache[name] = None
+    return cache[name]
+
+def getRegions(config):
+    '''
+    Get Every Region to Collect: the Configured Region First, then Any Extra
+    Named Regions Listed under `regions`. A Region with a `geojson` Polygon is
+    Bounded by the Polygon instead of its Box.
+
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :return: A List of Region Dictionaries (name, latLower, latUpper, lonLower,
+             lonUpper, and a `polygon` if the Region has One).
+    '''
+    regions = [{'name': config['model']['regionName'],
+                'latLower': config['model']['latLower'],
+                'latUpper': config['model']['latUpper'],
+                'lonLower': config['model']['lonLower'],
+                'lonUpper': config['model']['lonUpper'],
+                'geojson': config['model'].get('regionGeoJSON')}]
+    for region in config['model'].get('regions') or []:
+        if region['name'] != regions[0]['name']:
+            regions.append(dict(region))
+
+    # Parse Each Polygon Once; its Bounding Box Fills in Any Missing Box
+    for region in regions:
+        region['polygon'] = None
+        if region.get('geojson') is not None:
+            region['polygon'] = geometry.PolygonRegion(region['geojson'])
+            region.setdefault('latLower', region['polygon'].latBox[0])
+            region.setdefault('latUpper', region['polygon'].latBox[1])
+            region.setdefault('lonLower', region['polygon'].lonBox[0])
+            region.setdefault('lonUpper', region['polygon'].lonBox[1])
+    return regions
+
+def getRegionFileName(config, regionName):
+    '''
+    Get the H5 File Name a Region's Data is Collected To; the Configured Region
+    Uses `h5FileName` Itself.
+
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :param regionName: The Name of the Region.
+    :return: The H5 File Name (Relative to /data).
+    '''
+    h5FileName = config['model']['h5FileName']
+    if regionName == config['model']['regionName']:
+        return h5FileName
+    stem, extension = os.path.splitext(h5FileName)
+    return stem + '_' + regionName + (extension or '.h5')
+
+def selectRegion(config, regionName):
+    '''
+    Make a Configuration whose Region (Name, Bounds, and H5 File) is one of the
+    Extra Named Regions, so its Collected Store is the One Analyzed. The Copy
+    Has No Extra Regions, so Collecting with it Only Writes that Region.
+
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :param regionName: The Name of the Region.
+    :return: A Copy of the Configuration for that Region.
+    '''
+    for region in getRegions(config):
+        if region['name'] == regionName:
+            regionConfig = copy.deepcopy(config)
+            regionConfig['model']['h5FileName'] = getRegionFileName(config, regionName)
+            regionConfig['model'].update((k, region[k]) for k in ['latLower', 'latUpper', 'lonLower', 'lonUpper'])
+            regionConfig['model']['regionGeoJSON'] = region.get('geojson')
+            regionConfig['model']['regionName'] = regionName
+            regionConfig['model']['regions'] = []
+            return regionConfig
+    print('ERROR : %s is Not a Configured Region.' % regionName)
+    sys.exit(errno.EINVAL)
+
+def getRegionMask(region, lat, lon):
+    '''
+    Find the Pixels Inside a Region.
+
+    :param region: The Region Dictionary.
+    :param lat: The Pixel Center Latitudes.
+    :param lon: The Pixel Center Longitudes.
+    :return: A Boolean Mask of the Pixels Inside the Region.
+    '''
+    if region.get('polygon') is not None:
+        return region['polygon'].contains(lat, lon)
+    return (lon > region['lonLower']) & (lon < region['lonUpper']) & \
+           (lat > region['latLower']) & (lat < region['latUpper'])
+
 def collectData(config, ncList):
     '''
     Collect the Data Specicied in the Configuration.
@@ -69,12 +253,27 @@ def collectData(config, ncList):
     :param ncList: A List of All Data NetCDF Files.
     :return: A Map of Variable Names to a List of their NetCDF Data Structures.
     '''
-    # Find Region Name and Lat/Lon Bounding Box from Configuration
-    regionName = config['model']['regionName']
-    latLower = config['model']['latLower']
-    latUpper = config['model']['latUpper']
-    lonLower = config['model']['lonLower']
-    lonUpper = config['model']['lonUpper']
+    from h5py import File
+    fileNames = collectRegions(config, ncList)
+    if config['model']['regionName'] not in fileNames:
+        print('Exiting: No Observations Found.')
+        sys.exit(errno.EINVAL)
+    return File(os.path.join('data/', fileNames[config['model']['regionName']]), 'r+')
+
+def collectRegions(config, ncList):
+    '''
+    Collect the Data of Every Configured Region in One Pass: Each Orbit File is
+    Opened Once, and Every Region's Pixels Come from a Single Lat/Lon Read.
+
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :param ncList: A List of All Data NetCDF Files.
+    :return: A Map of Region Names to the H5 File Names their Data was Written To.
+    '''
+    from netCDF4 import Dataset
+
+    # Find the Region Names and Lat/Lon Bounding Boxes from Configuration
+    regions = getRegions(config)
+    regionName = regions[0]['name']
 
     # Get All the Variables we want to Copy, Separated by NetCDF Group
     prodVars = config['model']['prodVars']
@@ -83,29 +282,18 @@ def collectData(config, ncList):
     inputVars = config['model']['inputVars']
 
     # Create a Universal Map of All Variables to Copy
-    # Map Variable Names to Empty Collection
     allVars = []
     allVars.extend([(u'PRODUCT/' + v) for v in prodVars])
     allVars.extend([(u'PRODUCT/SUPPORT_DATA/GEOLOCATIONS/' + v) for v in geoVars])
     allVars.extend([(u'PRODUCT/SUPPORT_DATA/DETAILED_RESULTS/' + v) for v in detailedVars])
     allVars.extend([(u'PRODUCT/SUPPORT_DATA/INPUT_DATA/' + v) for v in inputVars])
-    varMap = dict.fromkeys([v.split('/')[-1] for v in allVars])
     TO_SKIP = ['PRODUCT/time_utc',
                u'PRODUCT/SUPPORT_DATA/GEOLOCATIONS/latitude_bounds',
                u'PRODUCT/SUPPORT_DATA/GEOLOCATIONS/longitude_bounds']
+    CORNERS = ['LowLeft', 'LowRight', 'UpRight', 'UpLeft']
 
-    # Create Data Structures for Storing Data in Spatial Order
-    for v in varMap.keys():
-        varMap[v] = []
-    varMap['latLowLeft'] = []
-    varMap['lonLowLeft'] = []
-    varMap['latLowRight'] = []
-    varMap['lonLowRight'] = []
-    varMap['latUpRight'] = []
-    varMap['lonUpRight'] = []
-    varMap['latUpLeft'] = []
-    varMap['lonUpLeft'] = []
-    areObs = False
+    # Create Data Structures for Storing Each Region's Data, Orbit by Orbit
+    varMaps = {region['name']: [] for region in regions}
 
     # Find the Values for All Variables
     numDone = 0
@@ -118,75 +306,115 @@ def collectData(config, ncList):
         try:
             lat = ncFile['PRODUCT/latitude'][:].data[0].flatten()
             lon = ncFile['PRODUCT/longitude'][:].data[0].flatten()
-            sd = dt.datetime(2010, 1, 1) + dt.timedelta(seconds = int(ncFile['PRODUCT/time'][:].data[0]))
+            sd = int(ncFile['PRODUCT/time'][:].data[0])
         except KeyError as ke:
             numTotal -= 1
+            ncFile.close()
             continue
 
-        # Find Indices of Spatial Locations in the Data (within the Bounding Box)
-        # If they Exist, Collect Time-Space Data in Detail
-        locInds = np.where((lon > lonLower) * (lon < lonUpper) * (lat > latLower) * (lat < latUpper))[0]
+        # Find Indices of Each Region's Locations in the Data (within its
+        # Bounds and Passing the Quality Predicates); Rejected Pixels are Never
+        # Copied. If they Exist, Collect Time-Space Data in Detail
+        masks = [getRegionMask(region, lat, lon) for region in regions]
+        full = {}
+        if any(mask.any() for mask in masks):
+            quality = getQualityMask(config, lambda v: _readFull(ncFile, v, full), lat.shape[0])
+            if quality is not None:
+                masks = [mask & quality for mask in masks]
+        locInds = {region['name']: np.flatnonzero(mask) for region, mask in zip(regions, masks)}
+        locInds = {name: inds for name, inds in locInds.items() if len(inds) > 0}
         if len(locInds) > 0:
-            areObs = True
-            time = []
-            for t in ncFile['PRODUCT/delta_time'][:].data[0]:
-                # Get the Detailed Time Data (Seconds since 2010-01-01)
-                time.extend([(sd + dt.timedelta(seconds = int(t) / 1e3)) \
-                             for i in range(ncFile['PRODUCT/latitude'][:].data[0].shape[1])])
-            time = np.array(time)
+            # Get the Detailed Time Data (Seconds since 2010-01-01); Every Ground
+            # Pixel in a Scanline Shares that Scanline's Time
+            numPixels = ncFile['PRODUCT/latitude'].shape[-1]
+            deltaTime = ncFile['PRODUCT/delta_time'][:].data[0].astype(np.float64) / 1e3
+            time = sd + np.repeat(deltaTime, numPixels)
 
             # Create an H5 File to Store Results more Concisely
-            h5Name = 'tropomi_samples_' + regionName + '_' + time[0].strftime('%Y%m%d%H%M%S')
-            h5Name += ('_' + time[-1].strftime('%Y%m%d%H%M%S') + '.h5')
+            firstTime = dt.datetime(2010, 1, 1) + dt.timedelta(seconds = float(time[0]))
+            lastTime = dt.datetime(2010, 1, 1) + dt.timedelta(seconds = float(time[-1]))
+            h5Name = 'tropomi_samples_' + regionName + '_' + firstTime.strftime('%Y%m%d%H%M%S')
+            h5Name += ('_' + lastTime.strftime('%Y%m%d%H%M%S') + '.h5')
             if os.path.exists(h5Name):
                 os.remove(h5Name)
 
-            # Get/Add the Detailed Spatial Data
+            # Get/Add the Detailed Spatial Data; Each Variable is Read Once and
+            # Copied into Every Region that has Pixels in this Orbit
+            orbits = {name: {} for name in locInds}
             latStar = ncFile[u'PRODUCT/SUPPORT_DATA/GEOLOCATIONS/latitude_bounds'][:].data[0]
             lonStar = ncFile[u'PRODUCT/SUPPORT_DATA/GEOLOCATIONS/longitude_bounds'][:].data[0]
-            varMap['latLowLeft'] = latStar[:,:,0].flatten()[locInds]
-            varMap['lonLowLeft'] = lonStar[:,:,0].flatten()[locInds]
-            varMap['latLowRight'] = latStar[:,:,1].flatten()[locInds]
-            varMap['lonLowRight'] = lonStar[:,:,1].flatten()[locInds]
-            varMap['latUpRight'] = latStar[:,:,2].flatten()[locInds]
-            varMap['lonUpRight'] = lonStar[:,:,2].flatten()[locInds]
-            varMap['latUpLeft'] = latStar[:,:,3].flatten()[locInds]
-            varMap['lonUpLeft'] = lonStar[:,:,3].flatten()[locInds]
+            for i, corner in enumerate(CORNERS):
+                latCorner = latStar[:,:,i].flatten()
+                lonCorner = lonStar[:,:,i].flatten()
+                for name, inds in locInds.items():
+                    orbits[name]['lat' + corner] = latCorner[inds]
+                    orbits[name]['lon' + corner] = lonCorner[inds]
 
             # Add the Detailed Time Data
             for v in allVars:
                 vTrunc = v.split('/')[-1]
                 if v == 'PRODUCT/time':
-                    varMap[vTrunc].extend(np.array([(t - dt.datetime(2010, 1, 1)).total_seconds() \
-                                                    for t in time[locInds]]))
+                    values = time
                 elif v in TO_SKIP:
                     continue
+                elif full.get(vTrunc) is not None:
+                    values = full[vTrunc]
                 else:
-                    varMap[vTrunc].extend(ncFile[v][:].data[0].flatten()[locInds])
+                    values = ncFile[v][:].data[0].flatten()
+                for name, inds in locInds.items():
+                    orbits[name][vTrunc] = values[inds]
+
+            # Keep Each Orbit's Columns as Arrays (in the Compact Schema if Enabled)
+            for name, orbit in orbits.items():
+                if schema.isCompact(config):
+                    orbit = schema.toCompact(orbit, config)[0]
+                varMaps[name].append(orbit)
             numDone += 1
             print('Done [%d/%d]' % (numDone, numTotal))
+        ncFile.close()
 
-    # Error Out if no Data was Found
-    if not areObs:
+    # Error Out if no Data was Found for Any Region
+    if all(len(varMap) == 0 for varMap in varMaps.values()):
         print('Exiting: No Observations Found.')
         sys.exit(errno.EINVAL)
 
-    # Otherwise, Write to the Specified H5 Outfile
-    h5FileName = config['model']['h5FileName']
-    h5Out = File(os.path.join('data/', h5FileName), 'w')
-    for v in allVars:
-        if v in TO_SKIP:
+    # Otherwise, Write Each Region to its H5 Outfile
+    fileNames = {}
+    for name, varMap in varMaps.items():
+        if len(varMap) == 0:
+            print('No Observations Found for %s.' % name)
             continue
-        vTrunc = v.split('/')[-1]
-        h5Out.create_dataset(vTrunc, data = varMap[vTrunc][:])
-    for corner in ['LowLeft', 'LowRight', 'UpLeft', 'UpRight']:
-        for l in ['lat', 'lon']:
-            h5Out.create_dataset(l + corner, data = varMap[l + corner][:])
-    h5Out.close()
-
-    # Return the Data Map
-    M = File(os.path.join('data/', h5FileName), 'r+')
-    return M
+        fileNames[name] = getRegionFileName(config, name)
+        if schema.isCompact(config):
+            columns, attributes = schema.concatenate(varMap, config)
+        else:
+            columns = {v: np.concatenate([orbit[v] for orbit in varMap]) for v in varMap[0]}
+            attributes = None
+        storage.writeH5(os.path.join('data/', fileNames[name]), columns,
+                        layout = config['model'].get('h5Layout', storage.DEFAULT_LAYOUT),
+                        chunkRows = config['model'].get('h5ChunkRows', storage.DEFAULT_CHUNK_ROWS),
+                        compression = config['model'].get('h5Compression'),
+                        attributes = attributes)
+
+    # Return the Region Stores
+    return fileNames
+
+def _getDataFromRDataWithR(fileName, frameName):
+    '''
+    Load an RData File through an Embedded R Session (Requires rpy2 and R).
+
+    :param fileName: The Path to the RData File.
+    :param frameName: The Name of the R Data Frame.
+    :return: A Map of Column Names to NumPy Arrays.
+    '''
+    try:
+        import rpy2.robjects as R
+        R.r['load'](fileName)
+        RData = R.globalenv[frameName]
+        return {str(name): np.array(RData[i]) for i, name in enumerate(RData.names)}
+    except Exception as fe:
+        print('No RData File Resides in the /data Directory')
+        sys.exit(errno.EINVAL)
 
 # Class Functions
 def getDataFromNetCDF(config):
@@ -208,7 +436,7 @@ def getDataFromNetCDF(config):
     M = applyDateFilter(config, M)
 
     # Return the Model Data
-    return M
+    return _prepareData(config, M)
 
 def getDataFromH5(config):
     '''
@@ -217,16 +445,24 @@ def getDataFromH5(config):
     :param config: The Dictionary of Configuration Settings from the YAML.
     :return: A Cleaned Model Matrix of Relevant Observations and Predictors.
     '''
-    # Open the H5 File and Return the Data
+    # Open the H5 File and Return the Data; Chunked Stores are Sorted by Time,
+    # so Reading Only the Rows in the Configured Date Window is Already Exact
+    from h5py import File
+    fileName = os.path.join('data/', config['model']['h5FileName'])
     try:
-        M = File(os.path.join('data/', config['model']['h5FileName']), 'r+')
+        if storage.isChunked(fileName):
+            timeRange = None
+            if config['model']['startDate'] is not None and config['model']['endDate'] is not None:
+                timeRange = (_dateToTime(config['model']['startDate']), _dateToTime(config['model']['endDate']))
+            return _prepareData(config, storage.readH5(fileName, timeRange = timeRange))
+        M = File(fileName, 'r+')
     except OSError as fe:
         print('No H5 File Written Yet - Reading from NetCDF')
         M = getDataFromNetCDF(config)
 
     # Apply a Date Filter to the Data
     M = applyDateFilter(config, M)
-    return M
+    return _prepareData(config, M)
 
 def getDataFromJSON(config):
     '''
@@ -245,7 +481,7 @@ def getDataFromJSON(config):
 
     # Apply a Date Filter to the Data
     M = applyDateFilter(config, M)
-    return M
+    return _prepareData(config, M)
 
 def getDataFromRData(config):
     '''
@@ -254,17 +490,19 @@ def getDataFromRData(config):
     :param config: The Dictionary of Configuration Settings from the YAML.
     :return: A Cleaned Model Matrix of Relevant Observations and Predictors.
     '''
-    # Open the RData File and Return the Data
+    # Open the RData File and Return the Data; Decode it Natively where
+    # Possible and Only Start an Embedded R Session as a Fallback
+    from software.collect import rdata
+    fileName = os.path.join('data/', config['model']['RDataFileName'])
     try:
-        R.r['load'](os.path.join('data/', config['model']['RDataFileName']))
-        RData = robjects.globalenv[config['model']['RDataFrameName']]
-        names = np.array(RData.names)
-        values = np.array(R.r[config['model']['RDataFrameName']])
-        M = {names[i]: values[i, :] for i in range(names.shape[0])}
+        M = rdata.getDataFrame(fileName, config['model']['RDataFrameName'])
+    except (ValueError, KeyError, struct.error) as ve:
+        print('Native RData Read Failed (%s) - Trying rpy2' % ve)
+        M = _getDataFromRDataWithR(fileName, config['model']['RDataFrameName'])
     except Exception as fe:
         print('No RData File Resides in the /data Directory')
         sys.exit(errno.EINVAL)
 
     # Apply a Date Filter to the Data
     M = applyDateFilter(config, M)
-    return M
+    return _prepareData(config, M)
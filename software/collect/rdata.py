@@ -0,0 +1,375 @@
+#! /usr/bin/python3.6
+'''
+Read R Data (RData/RDS) Files Natively without an Embedded R Session.
+
+Only the XDR (Big-Endian Binary) Serialization Format is Supported, which is
+What `save()` and `saveRDS()` Write by Default. Numeric Vectors are Decoded
+Straight from the File Buffer into NumPy Arrays.
+'''
+
+# System Functions
+import bz2
+import gzip
+import lzma
+import struct
+
+# Data-Related Functions
+import numpy as np
+
+# R Serialization Type Codes (See R's `serialize.c`)
+NILSXP = 0
+SYMSXP = 1
+LISTSXP = 2
+CLOSXP = 3
+ENVSXP = 4
+PROMSXP = 5
+LANGSXP = 6
+SPECIALSXP = 7
+BUILTINSXP = 8
+CHARSXP = 9
+LGLSXP = 10
+INTSXP = 13
+REALSXP = 14
+CPLXSXP = 15
+STRSXP = 16
+DOTSXP = 17
+VECSXP = 19
+EXPRSXP = 20
+BCODESXP = 21
+EXTPTRSXP = 22
+WEAKREFSXP = 23
+RAWSXP = 24
+S4SXP = 25
+ALTREP_SXP = 238
+ATTRLISTSXP = 239
+ATTRLANGSXP = 240
+BASEENV_SXP = 241
+EMPTYENV_SXP = 242
+GENERICREFSXP = 245
+CLASSREFSXP = 246
+PERSISTSXP = 247
+PACKAGESXP = 248
+NAMESPACESXP = 249
+BASENAMESPACE_SXP = 250
+MISSINGARG_SXP = 251
+UNBOUNDVALUE_SXP = 252
+GLOBALENV_SXP = 253
+NILVALUE_SXP = 254
+REFSXP = 255
+
+# Pairlist-Like Types Share a Layout: [Attributes] [Tag] CAR CDR
+PAIRLIST_TYPES = (LISTSXP, LANGSXP, CLOSXP, PROMSXP, DOTSXP, ATTRLISTSXP, ATTRLANGSXP)
+
+# Special Values
+NA_INTEGER = -2 ** 31
+IS_OBJECT_BIT = 1 << 8
+HAS_ATTR_BIT = 1 << 9
+HAS_TAG_BIT = 1 << 10
+LATIN1_MASK = 1 << 2
+UTF8_MASK = 1 << 3
+
+# Vector Element Types as Stored in the XDR Stream
+XDR_DTYPES = {LGLSXP: np.dtype('>i4'),
+              INTSXP: np.dtype('>i4'),
+              REALSXP: np.dtype('>f8'),
+              CPLXSXP: np.dtype('>c16')}
+
+class RObject:
+    '''
+    A Minimal Container for a Deserialized R Object: its Type Code, its
+    Value (a NumPy Array, a List, a String, or None), and its Attributes.
+    '''
+    def __init__(self, sexpType, value = None, attributes = None):
+        '''
+        The Default Constructor.
+        '''
+        self.sexpType = sexpType
+        self.value = value
+        self.attributes = attributes if attributes is not None else {}
+
+    def getClass(self):
+        '''
+        Get the R `class` Attribute of this Object.
+
+        :return: A List of Class Names (Empty if there is no Class).
+        '''
+        rClass = self.attributes.get('class')
+        return list(rClass.value) if rClass is not None else []
+
+    def __repr__(self):
+        return 'RObject(type = %d, class = %s)' % (self.sexpType, self.getClass())
+
+class _XDRReader:
+    '''
+    Walk an XDR Serialization Stream and Rebuild the R Object Tree.
+    '''
+    def __init__(self, buffer, offset = 0):
+        '''
+        The Default Constructor.
+        '''
+        self.buffer = buffer
+        self.offset = offset
+        self.refTable = []
+
+    def readInt(self):
+        value = struct.unpack_from('>i', self.buffer, self.offset)[0]
+        self.offset += 4
+        return value
+
+    def readLength(self):
+        length = self.readInt()
+        if length == -1:
+            upper = self.readInt()
+            lower = self.readInt()
+            length = (upper << 32) + lower
+        return length
+
+    def readBytes(self, length):
+        value = bytes(self.buffer[self.offset:(self.offset + length)])
+        self.offset += length
+        return value
+
+    def readArray(self, sexpType, length):
+        '''
+        Read a Numeric Vector Directly from the Buffer and Convert it Once to
+        Native Byte Order.
+        '''
+        dtype = XDR_DTYPES[sexpType]
+        array = np.frombuffer(self.buffer, dtype = dtype, count = length, offset = self.offset)
+        self.offset += length * dtype.itemsize
+        return array.astype(dtype.newbyteorder('='))
+
+    def readHeader(self):
+        '''
+        Read the Serialization Header and Check the Format Version.
+        '''
+        if self.readBytes(2) != b'X\n':
+            raise ValueError('Only XDR Serialized R Data is Supported.')
+        version = self.readInt()
+        self.readInt()
+        self.readInt()
+        if version == 3:
+            self.readBytes(self.readInt())
+        elif version != 2:
+            raise ValueError('Unsupported R Serialization Version %d.' % version)
+
+    def readCharacter(self, flags):
+        length = self.readInt()
+        if length == -1:
+            return None
+        raw = self.readBytes(length)
+        levels = flags >> 12
+        if levels & LATIN1_MASK:
+            return raw.decode('latin-1')
+        return raw.decode('utf-8', errors = 'replace')
+
+    def readStringVector(self):
+        self.readInt()
+        return [self.readItem() for i in range(self.readInt())]
+
+    def readAttributes(self):
+        '''
+        Convert an Attribute Pairlist into a Dictionary Keyed by Tag Name.
+        '''
+        pairs = self.readItem()
+        if pairs is None:
+            return {}
+        return {tag: value for tag, value in pairs.value}
+
+    def readPairlist(self, sexpType, flags):
+        '''
+        Read a Pairlist Iteratively, so Long Lists (such as an RData Frame of
+        Many Objects) Do Not Recurse once per Cell.
+        '''
+        cells = []
+        attributes = {}
+        while True:
+            if flags & HAS_ATTR_BIT:
+                cellAttributes = self.readAttributes()
+                if not cells:
+                    attributes = cellAttributes
+            tag = self.readItem() if flags & HAS_TAG_BIT else None
+            cells.append((tag, self.readItem()))
+
+            # Continue Down the CDR while it is Another Pairlist Cell
+            flags = self.readInt()
+            nextType = flags & 0xFF
+            if nextType not in (LISTSXP, ATTRLISTSXP):
+                self.offset -= 4
+                self.readItem()
+                break
+        return RObject(sexpType, cells, attributes)
+
+    def readAltrep(self):
+        '''
+        Expand the Compact ALTREP Classes R Writes for Sequences and Wrappers.
+        '''
+        info = self.readItem()
+        state = self.readItem()
+        attributes = self.readItem()
+        className = info.value[0][1]
+        if className in ('compact_intseq', 'compact_realseq'):
+            length, start, step = state.value[:3]
+            value = start + step * np.arange(int(length))
+            if className == 'compact_intseq':
+                result = RObject(INTSXP, value.astype(np.int32))
+            else:
+                result = RObject(REALSXP, value.astype(np.float64))
+        elif className.startswith('wrap_'):
+            result = state.value[0][1]
+        elif className == 'deferred_string':
+            argument = state.value[0][1]
+            result = RObject(STRSXP, [str(v) for v in argument.value])
+        else:
+            raise ValueError('Unsupported ALTREP Class %s.' % className)
+        if attributes is not None:
+            result.attributes = {tag: value for tag, value in attributes.value}
+        return result
+
+    def readItem(self):
+        '''
+        Read One Serialized Item and Return it as Python Data.
+        '''
+        flags = self.readInt()
+        sexpType = flags & 0xFF
+
+        # Special Singletons and References
+        if sexpType in (NILVALUE_SXP, NILSXP):
+            return None
+        if sexpType in (GLOBALENV_SXP, EMPTYENV_SXP, BASEENV_SXP, BASENAMESPACE_SXP,
+                        UNBOUNDVALUE_SXP, MISSINGARG_SXP):
+            return RObject(sexpType)
+        if sexpType == REFSXP:
+            index = flags >> 8
+            if index == 0:
+                index = self.readInt()
+            return self.refTable[index - 1]
+        if sexpType in (PERSISTSXP, PACKAGESXP, NAMESPACESXP):
+            result = RObject(sexpType, self.readStringVector())
+            self.refTable.append(result)
+            return result
+        if sexpType == ALTREP_SXP:
+            return self.readAltrep()
+
+        # Symbols are Stored Once and then Referenced
+        if sexpType == SYMSXP:
+            name = self.readItem()
+            self.refTable.append(name)
+            return name
+        if sexpType == CHARSXP:
+            return self.readCharacter(flags)
+        if sexpType in PAIRLIST_TYPES:
+            return self.readPairlist(sexpType, flags)
+        if sexpType == ENVSXP:
+            result = RObject(sexpType)
+            self.refTable.append(result)
+            self.readInt()
+            enclosure = self.readItem()
+            frame = self.readItem()
+            hashTable = self.readItem()
+            result.attributes = self.readAttributes()
+            result.value = (enclosure, frame, hashTable)
+            return result
+        if sexpType in (SPECIALSXP, BUILTINSXP):
+            return RObject(sexpType, self.readBytes(self.readInt()).decode('ascii'))
+        if sexpType == EXTPTRSXP:
+            result = RObject(sexpType)
+            self.refTable.append(result)
+            result.value = (self.readItem(), self.readItem())
+        elif sexpType == WEAKREFSXP:
+            result = RObject(sexpType)
+            self.refTable.append(result)
+        elif sexpType == S4SXP:
+            result = RObject(sexpType)
+
+        # Vectors: Length, Contents, then (Optionally) Attributes
+        elif sexpType in XDR_DTYPES:
+            result = RObject(sexpType, self.readArray(sexpType, self.readLength()))
+        elif sexpType == STRSXP:
+            result = RObject(sexpType, [self.readItem() for i in range(self.readLength())])
+        elif sexpType in (VECSXP, EXPRSXP):
+            result = RObject(sexpType, [self.readItem() for i in range(self.readLength())])
+        elif sexpType == RAWSXP:
+            result = RObject(sexpType, np.frombuffer(self.readBytes(self.readLength()), dtype = np.uint8))
+        else:
+            raise ValueError('Unsupported R Object Type %d.' % sexpType)
+        if flags & HAS_ATTR_BIT:
+            result.attributes = self.readAttributes()
+        return result
+
+def _decompress(raw):
+    '''
+    Undo the gzip/bzip2/xz Compression R Applies when Saving.
+    '''
+    if raw[:2] == b'\x1f\x8b':
+        return gzip.decompress(raw)
+    if raw[:3] == b'BZh':
+        return bz2.decompress(raw)
+    if raw[:6] == b'\xfd7zXZ\x00':
+        return lzma.decompress(raw)
+    return raw
+
+def readRData(fileName):
+    '''
+    Read Every Object Saved in an RData File (or the Single Object in an RDS File).
+
+    :param fileName: The Path to the RData/RDS File.
+    :return: A Map of Object Names to their `RObject` Trees.
+    '''
+    with open(fileName, 'rb') as fin:
+        buffer = memoryview(_decompress(fin.read()))
+
+    # RData Files Carry a Magic Number; RDS Files Start at the Serialization Header
+    magic = bytes(buffer[:5])
+    if magic in (b'RDX2\n', b'RDX3\n'):
+        reader = _XDRReader(buffer, 5)
+        reader.readHeader()
+        objects = reader.readItem()
+        return {tag: value for tag, value in objects.value} if objects is not None else {}
+    elif magic[:4] in (b'RDA2', b'RDA3', b'RDB2', b'RDB3'):
+        raise ValueError('Only XDR Serialized R Data is Supported.')
+    reader = _XDRReader(buffer)
+    reader.readHeader()
+    return {None: reader.readItem()}
+
+def _columnToArray(column):
+    '''
+    Convert an R Data Frame Column to a NumPy Array (Factors Become Strings,
+    Integer/Logical NAs Become NaN).
+    '''
+    if column.sexpType in (INTSXP, LGLSXP):
+        values = column.value
+        levels = column.attributes.get('levels')
+        if levels is not None:
+            labels = np.array(levels.value + [None], dtype = object)
+            codes = np.where(values == NA_INTEGER, 0, values)
+            return labels[codes - 1]
+        if column.sexpType == LGLSXP or (values == NA_INTEGER).any():
+            values = values.astype(np.float64)
+            values[column.value == NA_INTEGER] = np.nan
+        return values
+    if column.sexpType == STRSXP:
+        return np.array(column.value, dtype = object)
+    if column.sexpType in (REALSXP, CPLXSXP):
+        return column.value
+    raise ValueError('Unsupported Data Frame Column Type %d.' % column.sexpType)
+
+def getDataFrame(fileName, frameName = None):
+    '''
+    Get a Data Frame from an RData/RDS File as a Map of Column Names to Arrays.
+
+    :param fileName: The Path to the RData/RDS File.
+    :param frameName: The Name of the Data Frame (Ignored for RDS Files).
+    :return: A Map of Column Names to NumPy Arrays.
+    '''
+    objects = readRData(fileName)
+    if None in objects:
+        frame = objects[None]
+    elif frameName in objects:
+        frame = objects[frameName]
+    else:
+        raise KeyError('No Object Named %s in %s.' % (frameName, fileName))
+    if frame is None or frame.sexpType != VECSXP or 'data.frame' not in frame.getClass():
+        raise ValueError('%s is not a Data Frame.' % frameName)
+    names = frame.attributes['names'].value
+    return {names[i]: _columnToArray(frame.value[i]) for i in range(len(names))}
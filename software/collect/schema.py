@@ -0,0 +1,118 @@
+#! /usr/bin/python3.6
+'''
+The Compact Storage and In-Memory Schema for Collected TROPOMI Data.
+
+Physical Variables are float32, `qa_value` is a uint8 Percentage, the Surface
+Classification is uint8, Time is int32 Seconds since 2010-01-01, and the Pixel
+Corners Can be Quantized to int16 Offsets from the Pixel Center (a Corner whose
+Offsets Overflow int16, Such as across the Antimeridian, Stays float32).
+'''
+
+# Data-Related Functions
+import numpy as np
+
+# Encoded Variables: Name -> (Storage Type, Scale Factor, Fill Value)
+QA_SCALE = 0.01
+CORNER_SCALE = 1e-4
+ENCODINGS = {'qa_value': (np.uint8, QA_SCALE, 0),
+             'surface_classification': (np.uint8, 1, 255),
+             'time': (np.int32, 1, 0)}
+
+# Pixel Corner Variables and the Center they are Relative to
+CORNERS = {l + corner: ('latitude' if l == 'lat' else 'longitude')
+           for corner in ['LowLeft', 'LowRight', 'UpLeft', 'UpRight'] for l in ['lat', 'lon']}
+
+def isCompact(config):
+    '''
+    Check Whether the Configuration Asks for the Compact Schema.
+
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :return: True if the Compact Schema is Enabled.
+    '''
+    return bool(config['model'].get('compactSchema', False))
+
+def _encode(values, dtype, scale, fill):
+    '''
+    Scale and Cast to an Integer Type; NaNs and Out-of-Range Values (Such as
+    NetCDF Fill Values) Become `fill`.
+    '''
+    values = np.asarray(values, dtype = np.float64)
+    info = np.iinfo(dtype)
+    values = np.floor(np.round(values / scale) if scale != 1 else values)
+    valid = np.isfinite(values) & (values >= info.min) & (values <= info.max)
+    return np.where(valid, values, fill).astype(dtype)
+
+def _overflows(values, dtype, scale):
+    '''
+    Check Whether Any Finite Value is Out of an Integer Type's Range once Scaled.
+    '''
+    info = np.iinfo(dtype)
+    with np.errstate(invalid = 'ignore'):
+        scaled = np.round(np.asarray(values, dtype = np.float64) / scale)
+        return bool(np.any(np.isfinite(scaled) & ((scaled < info.min) | (scaled > info.max))))
+
+def toCompact(M, config):
+    '''
+    Convert a Data Map to the Compact Schema (Already Compact Columns are Kept).
+
+    :param M: A Map of Variable Names to Arrays.
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :return: The Compact Map and a Map of Variable Names to their H5 Attributes.
+    '''
+    quantizeCorners = config['model'].get('quantizeCorners', False)
+    compactM = {}
+    attributes = {}
+    for key in M:
+        values = np.asarray(M[key])
+        if key in ENCODINGS:
+            dtype, scale, fill = ENCODINGS[key]
+            if values.dtype != dtype:
+                values = _encode(values, dtype, scale, fill)
+            if scale != 1:
+                attributes[key] = {'scale_factor': scale}
+        elif key in CORNERS and quantizeCorners and values.dtype != np.int16:
+            offsets = values - np.asarray(M[CORNERS[key]], dtype = np.float64)
+            if _overflows(offsets, np.int16, CORNER_SCALE):
+                values = values.astype(np.float32)
+            else:
+                values = _encode(offsets, np.int16, CORNER_SCALE, 0)
+                attributes[key] = {'scale_factor': CORNER_SCALE, 'relative_to': CORNERS[key]}
+        elif key in CORNERS and values.dtype == np.int16:
+            attributes[key] = {'scale_factor': CORNER_SCALE, 'relative_to': CORNERS[key]}
+        elif values.dtype.kind == 'f' and values.dtype != np.float32:
+            values = values.astype(np.float32)
+        compactM[key] = values
+    return compactM, attributes
+
+def concatenate(parts, config):
+    '''
+    Join Compact Maps (Such as the Orbits of a Region) into One. A Corner Kept as
+    float32 in Any Part is Decoded to float32 in Every Part, so the Joined
+    Column has One Encoding.
+
+    :param parts: A List of Compact Maps with the Same Variables.
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :return: The Joined Compact Map and a Map of Variable Names to their H5 Attributes.
+    '''
+    for key in CORNERS:
+        dtypes = set(np.asarray(part[key]).dtype for part in parts if key in part)
+        if len(dtypes) > 1:
+            for part in parts:
+                part[key] = decode(part, key).astype(np.float32)
+    return toCompact({key: np.concatenate([part[key] for part in parts]) for key in parts[0]}, config)
+
+def decode(M, key):
+    '''
+    Get a Variable in Physical Units (qa_value as a Fraction, Corners as
+    Absolute Degrees), Whether or Not it is Stored Compactly.
+
+    :param M: The Data Map.
+    :param key: The Variable Name.
+    :return: A Floating-Point Array.
+    '''
+    values = np.asarray(M[key][:])
+    if key == 'qa_value' and values.dtype == np.uint8:
+        return values.astype(np.float32) * np.float32(QA_SCALE)
+    if key in CORNERS and values.dtype == np.int16:
+        return np.asarray(M[CORNERS[key]][:]) + values.astype(np.float32) * np.float32(CORNER_SCALE)
+    return values
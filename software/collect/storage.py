@@ -0,0 +1,174 @@
+#! /usr/bin/python3.6
+'''
+Write and Read the H5 Store of Collected TROPOMI Data.
+
+The 'chunked' Layout Sorts Rows by Time, Writes Every Variable in Fixed-Size
+Row Chunks (Optionally Compressed), and Keeps the Min/Max Time of Each Chunk,
+so Date-Window Reads Only Decompress the Chunks that Overlap. (Each Chunk Spans
+Whole Orbit Swaths, so a Latitude/Longitude Range per Chunk Would Rarely Prune
+Anything.) The 'flat' Layout is the Original Uncompressed One.
+'''
+
+# System Functions
+import logging
+logger = logging.getLogger(__name__)
+
+# Data-Related Functions
+import numpy as np
+
+# Layout Defaults
+DEFAULT_LAYOUT = 'flat'
+DEFAULT_CHUNK_ROWS = 65536
+INDEX_GROUP = '_chunkIndex'
+INDEXED_VARS = ['time']
+
+def _importFilters():
+    '''
+    Register the LZ4/Blosc HDF5 Filters if `hdf5plugin` is Installed.
+
+    :return: The `hdf5plugin` Module, or None.
+    '''
+    try:
+        import hdf5plugin
+        return hdf5plugin
+    except ImportError:
+        return None
+
+def getCompression(compression):
+    '''
+    Get the `create_dataset` Keyword Arguments for a Compression Choice.
+
+    :param compression: None, 'gzip' (with Shuffle), 'lz4', or 'blosc'.
+    :return: A Dictionary of Dataset Creation Keyword Arguments.
+    '''
+    if compression is None or compression == 'none':
+        return {}
+    if compression in ('lz4', 'blosc'):
+        hdf5plugin = _importFilters()
+        if hdf5plugin is not None and compression == 'lz4':
+            return dict(hdf5plugin.LZ4())
+        if hdf5plugin is not None:
+            return dict(hdf5plugin.Blosc(cname = 'lz4', clevel = 5, shuffle = hdf5plugin.Blosc.SHUFFLE))
+        logger.warning('hdf5plugin is Not Installed - Using Shuffle + gzip instead of %s' % compression)
+        compression = 'gzip'
+    if compression == 'gzip':
+        return {'compression': 'gzip', 'compression_opts': 1, 'shuffle': True}
+    raise ValueError('%s is not a Valid H5 Compression.' % compression)
+
+def writeH5(fileName, varMap, layout = DEFAULT_LAYOUT, chunkRows = DEFAULT_CHUNK_ROWS, compression = None,
+            attributes = None):
+    '''
+    Write a Map of Per-Row Variables to an H5 File.
+
+    :param fileName: The Path of the H5 File.
+    :param varMap: A Map of Variable Names to Equal-Length 1D Arrays.
+    :param layout: 'flat' or 'chunked'.
+    :param chunkRows: The Number of Rows per Chunk (Chunked Layout).
+    :param compression: The Compression Choice (Chunked Layout; See `getCompression`).
+    :param attributes: A Map of Variable Names to Dataset Attributes (Such as Scale Factors).
+    '''
+    from h5py import File
+    attributes = attributes or {}
+    if layout == 'flat':
+        with File(fileName, 'w') as h5Out:
+            for v in varMap:
+                h5Out.create_dataset(v, data = varMap[v])
+                h5Out[v].attrs.update(attributes.get(v, {}))
+        return
+    if layout != 'chunked':
+        raise ValueError('%s is not a Valid H5 Layout.' % layout)
+
+    # Sort Every Variable by Time
+    order = np.argsort(np.asarray(varMap['time']), kind = 'stable')
+    numRows = order.shape[0]
+    chunkRows = max(1, min(int(chunkRows), numRows))
+    filters = getCompression(compression)
+    with File(fileName, 'w') as h5Out:
+        h5Out.attrs['layout'] = 'chunked'
+        h5Out.attrs['chunkRows'] = chunkRows
+        index = h5Out.create_group(INDEX_GROUP)
+        for v in varMap:
+            values = np.asarray(varMap[v])[order]
+            h5Out.create_dataset(v, data = values, chunks = (chunkRows,), **filters)
+            h5Out[v].attrs.update(attributes.get(v, {}))
+
+            # Keep the Range of the Indexed Variables in Every Chunk
+            if v in INDEXED_VARS and numRows > 0:
+                starts = np.arange(0, numRows, chunkRows)
+                index.create_dataset(v + '_min', data = np.fmin.reduceat(values, starts))
+                index.create_dataset(v + '_max', data = np.fmax.reduceat(values, starts))
+
+def getChunkRuns(h5File, timeRange = None):
+    '''
+    Find the Runs of Consecutive Chunks whose Time Ranges Overlap the Query.
+
+    :param h5File: An Open H5 File in the Chunked Layout.
+    :param timeRange: The (start, end) Time in Seconds since 2010-01-01 (or None).
+    :return: A List of (startRow, endRow) Row Slices to Read.
+    '''
+    index = h5File[INDEX_GROUP]
+    chunkRows = int(h5File.attrs['chunkRows'])
+    numRows = h5File['time'].shape[0]
+    if 'time_min' not in index or timeRange is None:
+        return [(0, numRows)]
+    keep = (index['time_max'][:] >= timeRange[0]) & (index['time_min'][:] <= timeRange[1])
+
+    # Coalesce Consecutive Chunks into One Read Each
+    chunks = np.flatnonzero(keep)
+    if chunks.shape[0] == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(chunks) > 1)
+    firsts = chunks[np.concatenate(([0], breaks + 1))]
+    lasts = chunks[np.concatenate((breaks, [chunks.shape[0] - 1]))]
+    return [(int(f) * chunkRows, min((int(l) + 1) * chunkRows, numRows)) for f, l in zip(firsts, lasts)]
+
+def readH5(fileName, timeRange = None):
+    '''
+    Read an H5 Store into Memory. In the Chunked Layout, Only Chunks Overlapping
+    the Time Window are Read, and (Since Rows are Sorted by Time) the Window is
+    Exact.
+
+    :param fileName: The Path of the H5 File.
+    :param timeRange: The (start, end) Time in Seconds since 2010-01-01 (or None).
+    :return: A Map of Variable Names to NumPy Arrays.
+    '''
+    from h5py import File
+    _importFilters()
+    with File(fileName, 'r') as h5File:
+        names = [v for v in h5File if v != INDEX_GROUP]
+        if h5File.attrs.get('layout') != 'chunked':
+            return {v: h5File[v][:] for v in names}
+        runs = getChunkRuns(h5File, timeRange)
+
+        # Trim Each Run to the Exact Time Window by Binary Search
+        if timeRange is not None:
+            trimmed = []
+            for start, end in runs:
+                time = h5File['time'][start:end]
+                lower = start + int(np.searchsorted(time, timeRange[0], side = 'left'))
+                upper = start + int(np.searchsorted(time, timeRange[1], side = 'right'))
+                if upper > lower:
+                    trimmed.append((lower, upper))
+            runs = trimmed
+
+        M = {}
+        for v in names:
+            dataset = h5File[v]
+            if len(runs) == 1:
+                M[v] = dataset[runs[0][0]:runs[0][1]]
+            elif runs:
+                M[v] = np.concatenate([dataset[start:end] for start, end in runs])
+            else:
+                M[v] = np.empty((0,), dtype = dataset.dtype)
+        return M
+
+def isChunked(fileName):
+    '''
+    Check Whether an H5 File Uses the Chunked Layout.
+
+    :param fileName: The Path of the H5 File.
+    :return: True if the File is in the Chunked Layout.
+    '''
+    from h5py import File
+    with File(fileName, 'r') as h5File:
+        return h5File.attrs.get('layout') == 'chunked'
@@ -0,0 +1,135 @@
+#! /usr/bin/python3.6
+'''
+Polygon and MultiPolygon Regions from GeoJSON, with a Vectorized Point-in-Polygon
+Test over Pixel Centers.
+
+Points Outside the Region's Bounding Box are Dropped First. The Rest are Sorted
+by Latitude, so Each Polygon Edge Only Visits the Latitude Band it Spans (Found
+by Binary Search), and an Irregular Region Costs about as much as a Rectangle.
+'''
+
+# System Functions
+import os
+import json
+
+# Data-Related Functions
+import numpy as np
+
+def loadGeoJSON(source):
+    '''
+    Read a GeoJSON Object from a Dictionary, a JSON String, or a File Path.
+
+    :param source: The GeoJSON Dictionary, Text, or File Path.
+    :return: The GeoJSON Dictionary.
+    '''
+    if isinstance(source, dict):
+        return source
+    if not isinstance(source, str):
+        raise ValueError('GeoJSON Must be a Dictionary, a JSON String, or a File Path.')
+    text = source.strip()
+    if not text.startswith('{'):
+        if not os.path.isfile(text):
+            raise ValueError('No GeoJSON File Found at %s.' % text)
+        with open(text, 'r') as fin:
+            text = fin.read()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as je:
+        raise ValueError('Invalid GeoJSON: %s' % je)
+
+def _getPolygons(geoJSON):
+    '''
+    Flatten a GeoJSON Object into a List of Polygons, Each a List of Rings of
+    [Longitude, Latitude] Positions (the Outer Ring First, then Any Holes).
+    '''
+    kind = geoJSON.get('type') if isinstance(geoJSON, dict) else None
+    if kind == 'FeatureCollection':
+        return [polygon for feature in geoJSON['features'] for polygon in _getPolygons(feature)]
+    if kind == 'Feature':
+        return _getPolygons(geoJSON['geometry'])
+    if kind == 'GeometryCollection':
+        return [polygon for geometry in geoJSON['geometries'] for polygon in _getPolygons(geometry)]
+    if kind == 'Polygon':
+        return [geoJSON['coordinates']]
+    if kind == 'MultiPolygon':
+        return list(geoJSON['coordinates'])
+    raise ValueError('%s is not a Polygon or MultiPolygon GeoJSON Type.' % kind)
+
+def _getEdges(rings):
+    '''
+    Get the Edges of a Polygon's Rings as an (n x 4) Array of
+    (lon1, lat1, lon2, lat2), Closing Any Open Ring.
+    '''
+    edges = []
+    for ring in rings:
+        ring = np.asarray(ring, dtype = np.float64)
+        if ring.ndim != 2 or ring.shape[0] < 3 or ring.shape[1] < 2:
+            raise ValueError('Polygon Rings Need at Least Three [Longitude, Latitude] Positions.')
+        ring = ring[:, :2]
+        if not np.array_equal(ring[0], ring[-1]):
+            ring = np.vstack((ring, ring[:1]))
+        edges.append(np.hstack((ring[:-1], ring[1:])))
+    return np.vstack(edges)
+
+class PolygonRegion:
+    '''
+    A Region Bounded by One or More Polygons (with Holes). A Point is Inside if
+    it is Inside Any of the Polygons.
+    '''
+    def __init__(self, geoJSON):
+        '''
+        The Default Constructor.
+
+        :param geoJSON: A Polygon, MultiPolygon, Feature, or FeatureCollection
+                        (Dictionary, JSON String, or File Path).
+        '''
+        polygons = _getPolygons(loadGeoJSON(geoJSON))
+        if len(polygons) == 0:
+            raise ValueError('The GeoJSON Holds No Polygons.')
+        self.edges = [_getEdges(rings) for rings in polygons]
+        allEdges = np.vstack(self.edges)
+        self.latBox = (float(allEdges[:, [1, 3]].min()), float(allEdges[:, [1, 3]].max()))
+        self.lonBox = (float(allEdges[:, [0, 2]].min()), float(allEdges[:, [0, 2]].max()))
+
+    def contains(self, lat, lon, latSorted = False):
+        '''
+        Test which Points are Inside the Region (Even-Odd Rule, so Holes are
+        Excluded).
+
+        :param lat: The Point Latitudes.
+        :param lon: The Point Longitudes.
+        :param latSorted: Whether the Points are Already Sorted by Latitude.
+        :return: A Boolean Mask of the Points Inside the Region.
+        '''
+        lat = np.asarray(lat)
+        lon = np.asarray(lon)
+        inside = np.zeros(lat.shape[0], dtype = bool)
+
+        # Keep the Points in the Bounding Box, in Latitude Order
+        if latSorted:
+            lower = np.searchsorted(lat, self.latBox[0], side = 'left')
+            upper = np.searchsorted(lat, self.latBox[1], side = 'right')
+            lonBand = lon[lower:upper]
+            candidates = lower + np.flatnonzero((lonBand >= self.lonBox[0]) & (lonBand <= self.lonBox[1]))
+        else:
+            candidates = np.flatnonzero((lat >= self.latBox[0]) & (lat <= self.latBox[1]) & \
+                                        (lon >= self.lonBox[0]) & (lon <= self.lonBox[1]))
+            candidates = candidates[np.argsort(lat[candidates], kind = 'stable')]
+        candLat = lat[candidates]
+        candLon = lon[candidates]
+
+        # Cast a Ray East from Each Point; Each Edge Flips the Points in the
+        # Half-Open Latitude Band it Spans that Lie West of its Crossing
+        hit = np.zeros(candidates.shape[0], dtype = bool)
+        for edges in self.edges:
+            parity = np.zeros(candidates.shape[0], dtype = bool)
+            lows = np.searchsorted(candLat, np.minimum(edges[:, 1], edges[:, 3]), side = 'left')
+            highs = np.searchsorted(candLat, np.maximum(edges[:, 1], edges[:, 3]), side = 'left')
+            for (lon1, lat1, lon2, lat2), low, high in zip(edges, lows, highs):
+                if high <= low:
+                    continue
+                crossing = lon1 + (candLat[low:high] - lat1) * (lon2 - lon1) / (lat2 - lat1)
+                parity[low:high] ^= candLon[low:high] < crossing
+            hit |= parity
+        inside[candidates[hit]] = True
+        return inside
@@ -0,0 +1,215 @@
+#! /usr/bin/python3.6
+'''
+Instrument the Stages of the Methane Analysis Pipeline (Filtering, Thresholding,
+Model Fits, Ranking, and Visualization) and Export their Cost in the Prometheus
+Text Format.
+
+A Stage Costs Two Clock Reads unless `tracemalloc` is Tracing (See
+`traceMemory`). Its CPU Time is the Process's, so it Includes Work Done for it
+by Pool, scikit-learn, and BLAS Threads (and by Any Concurrent Request).
+
+Peak Allocations are Measured Only while Tracing on Python 3.9+ (which has
+`tracemalloc.reset_peak`); Otherwise they are None. The Traced Peak is
+Process-Wide, so:
+1. One Thread at a Time Owns it: the First to Open a Stage while No Other
+   Thread has One Open, until its Outermost Stage Closes.
+2. Each of the Owner's Stages Re-Arms the Peak when it Opens and Closes, and
+   Banks the Peak so Far into its Parent, so a Parent's Peak Covers its
+   Children's (Relative to the Parent's Starting Allocation).
+3. A Stage Opened by Another Thread while the Peak is Owned is an Overlap:
+   Every Owner Stage Open Meanwhile Reports No Peak, as its Peak Would Include
+   the Other Thread's Allocations. Non-Owner Stages Never Report a Peak.
+'''
+
+# System Functions
+import os
+import time
+import pstats
+import logging
+import cProfile
+import threading
+import contextlib
+import tracemalloc
+import datetime as dt
+logger = logging.getLogger(__name__)
+
+# Prometheus Metric Families: (Name, Type, Help, Stage Field)
+FAMILIES = [('tropomi_stage_calls_total', 'counter', 'Number of Times each Pipeline Stage Ran.', 'calls'),
+            ('tropomi_stage_seconds_total', 'counter', 'Wall Time Spent in each Pipeline Stage.', 'seconds'),
+            ('tropomi_stage_cpu_seconds_total', 'counter', 'Process CPU Time Spent during each Pipeline Stage.', 'cpuSeconds'),
+            ('tropomi_stage_rows_total', 'counter', 'Rows Processed by each Pipeline Stage.', 'rows'),
+            ('tropomi_stage_last_seconds', 'gauge', 'Wall Time of the Latest Run of each Pipeline Stage.', 'lastSeconds'),
+            ('tropomi_stage_peak_bytes', 'gauge', 'Largest Peak Allocation Seen in each Pipeline Stage.', 'peakBytes')]
+
+# The Innermost Open Stage of each Thread (Shared by All Registries, so Peaks
+# Fold across Them)
+_local = threading.local()
+
+# The Thread Owning the Traced Peak, the Open Stage Count of each Thread, and
+# the Number of Stages Opened by Other Threads while the Peak was Owned
+_traceLock = threading.Lock()
+_trace = {'owner': None, 'open': {}, 'overlaps': 0}
+
+def _enterTrace():
+    '''
+    Open a Stage on this Thread while Tracing.
+
+    :return: Whether this Thread Owns the Traced Peak, and the Overlap Count so Far.
+    '''
+    thread = threading.get_ident()
+    with _traceLock:
+        if _trace['owner'] is None and all(t == thread for t in _trace['open']):
+            _trace['owner'] = thread
+        elif _trace['owner'] != thread:
+            _trace['overlaps'] += 1
+        _trace['open'][thread] = _trace['open'].get(thread, 0) + 1
+        return _trace['owner'] == thread, _trace['overlaps']
+
+def _exitTrace():
+    '''
+    Close a Stage Opened with `_enterTrace`, Releasing the Peak with the Owner's
+    Outermost Stage.
+
+    :return: The Overlap Count so Far.
+    '''
+    thread = threading.get_ident()
+    with _traceLock:
+        _trace['open'][thread] -= 1
+        if _trace['open'][thread] == 0:
+            del _trace['open'][thread]
+            if _trace['owner'] == thread:
+                _trace['owner'] = None
+        return _trace['overlaps']
+
+class MetricsRegistry:
+    '''
+    A Thread-Safe Accumulator of Per-Stage Wall Time, CPU Time, Row Counts, and
+    Peak Allocations.
+    '''
+    def __init__(self):
+        '''
+        The Default Constructor.
+        '''
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, name, seconds, cpuSeconds, rows, peakBytes):
+        with self.lock:
+            stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'cpuSeconds': 0.0,
+                                                  'rows': 0, 'lastSeconds': 0.0, 'peakBytes': 0})
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['cpuSeconds'] += cpuSeconds
+            stats['rows'] += rows or 0
+            stats['lastSeconds'] = seconds
+            stats['peakBytes'] = max(stats['peakBytes'], peakBytes or 0)
+
+    @contextlib.contextmanager
+    def stage(self, name, rows = None):
+        '''
+        Time the Enclosed Block as the Pipeline Stage `name`. The Yielded Record
+        Takes a Row Count (`record['rows'] = n`) if it is Not Known Up Front.
+        See the Module Notes for what the CPU Time and Peak Cover.
+
+        :param name: The Name of the Stage.
+        :param rows: The Number of Rows the Stage Processes.
+        '''
+        record = {'rows': rows, 'peakBytes': None, 'startBytes': None}
+        parent = getattr(_local, 'current', None)
+        traced = tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak')
+        if traced:
+            owner, overlaps = _enterTrace()
+            if owner:
+                # Bank the Parent's Peak so Far before Re-Arming the Peak for this Stage
+                record['startBytes'], peak = tracemalloc.get_traced_memory()
+                self._foldPeak(parent, peak, 0)
+                tracemalloc.reset_peak()
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+        _local.current = record
+        try:
+            yield record
+        finally:
+            cpuSeconds = time.process_time() - cpuStart
+            seconds = time.perf_counter() - wallStart
+            if traced:
+                overlapped = _exitTrace() != overlaps
+                if owner and tracemalloc.is_tracing():
+                    # Fold this Stage's Peak (and its Children's) into the Parent, then Re-Arm
+                    self._foldPeak(record, tracemalloc.get_traced_memory()[1], 0)
+                    self._foldPeak(parent, record['peakBytes'], record['startBytes'])
+                    tracemalloc.reset_peak()
+                    if overlapped:
+                        record['peakBytes'] = None
+            _local.current = parent
+            self.record(name, seconds, cpuSeconds, record['rows'], record['peakBytes'])
+
+    @staticmethod
+    def _foldPeak(record, peakBytes, baseBytes):
+        '''
+        Raise a Stage Record's Peak to an Observed Peak, Measured Relative to
+        `baseBytes` Rather than the Stage's Own Starting Allocation.
+        '''
+        if record is None or record['startBytes'] is None:
+            return
+        peak = peakBytes + baseBytes - record['startBytes']
+        record['peakBytes'] = max(record['peakBytes'] or 0, peak)
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+    def toPrometheus(self):
+        '''
+        Render the Accumulated Metrics in the Prometheus Text Exposition Format.
+
+        :return: The Metrics Text.
+        '''
+        with self.lock:
+            stages = {name: dict(stats) for name, stats in self.stages.items()}
+        lines = []
+        for metric, metricType, helpText, field in FAMILIES:
+            lines.append('# HELP %s %s' % (metric, helpText))
+            lines.append('# TYPE %s %s' % (metric, metricType))
+            for name in sorted(stages):
+                lines.append('%s{stage="%s"} %s' % (metric, name.replace('"', '\\"'), repr(stages[name][field])))
+        return '\n'.join(lines) + '\n'
+
+# The Process-Wide Registry and its Shortcuts
+registry = MetricsRegistry()
+stage = registry.stage
+
+def traceMemory(enabled = True):
+    '''
+    Turn Peak Allocation Tracking On (or Off) for All Stages. This Slows
+    Allocation-Heavy Code, so it is Off by Default.
+
+    :param enabled: Whether to Trace Allocations.
+    '''
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+@contextlib.contextmanager
+def profiled(profileDir, label = 'request'):
+    '''
+    Capture a cProfile of the Enclosed Block and Save it (plus a Text Summary of
+    the Top Functions by Cumulative Time) to `profileDir`.
+
+    :param profileDir: The Directory to Save Profiles In.
+    :param label: A Label for the Profile File Names.
+    '''
+    if not os.path.isdir(profileDir):
+        os.makedirs(profileDir)
+    stem = os.path.join(profileDir, '%s_%s' % (label, dt.datetime.now().strftime('%Y%m%d%H%M%S%f')))
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield stem + '.prof'
+    finally:
+        profile.disable()
+        profile.dump_stats(stem + '.prof')
+        with open(stem + '.txt', 'w') as fout:
+            pstats.Stats(profile, stream = fout).sort_stats('cumulative').print_stats(40)
+        logger.info('Saved Profile to %s.prof' % stem)
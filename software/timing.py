@@ -0,0 +1,86 @@
+#! /usr/bin/python3.6
+'''
+Time the Startup Stages (Imports, Configuration, Data Loading) of the Methane
+Analysis Service so their Cost can be Tracked across Releases.
+'''
+
+# System Functions
+import os
+import sys
+import json
+import time
+import logging
+import contextlib
+logger = logging.getLogger(__name__)
+
+def getVersion():
+    '''
+    Get the Service Version from the VERSION File at the Repository Root.
+
+    :return: The Version String (or 'unknown').
+    '''
+    versionFile = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'VERSION')
+    try:
+        with open(versionFile, 'r') as fin:
+            return fin.read().strip()
+    except OSError:
+        return 'unknown'
+
+class StageTimer:
+    '''
+    Record the Wall Time, CPU Time, and Newly Imported Modules of Named Stages.
+    '''
+    def __init__(self):
+        '''
+        The Default Constructor.
+        '''
+        self.start = time.perf_counter()
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        Time the Enclosed Block as a Stage Called `name`.
+
+        :param name: The Name of the Stage.
+        '''
+        numModules = len(sys.modules)
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append({'stage': name,
+                                'wallSeconds': time.perf_counter() - wallStart,
+                                'cpuSeconds': time.process_time() - cpuStart,
+                                'modulesImported': len(sys.modules) - numModules})
+            logger.info('Stage %s Took %.3f s' % (name, self.stages[-1]['wallSeconds']))
+
+    def report(self):
+        '''
+        Summarize All Recorded Stages.
+
+        :return: A Dictionary with the Version, Total Time, and Per-Stage Timings.
+        '''
+        return {'version': getVersion(),
+                'python': sys.version.split()[0],
+                'totalSeconds': time.perf_counter() - self.start,
+                'modulesLoaded': len(sys.modules),
+                'stages': self.stages}
+
+    def write(self, outFile):
+        '''
+        Append the Report as One JSON Line, so Reports from Many Runs can be
+        Compared.
+
+        :param outFile: The Path of the Timing Report File.
+        '''
+        with open(outFile, 'a') as fout:
+            fout.write(json.dumps(self.report()) + '\n')
+
+    def __str__(self):
+        lines = ['%-20s %8.3f s wall %8.3f s cpu %5d modules' % \
+                 (s['stage'], s['wallSeconds'], s['cpuSeconds'], s['modulesImported']) \
+                 for s in self.stages]
+        lines.append('%-20s %8.3f s wall' % ('total', time.perf_counter() - self.start))
+        return '\n'.join(lines)
@@ -10,10 +10,9 @@ import errno
 import numpy as np
 import string
 import random
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-import plotly.io as pio
-from plotly.io import write_image
+from software import metrics
+
+# Plotly (and its Image Export Backend) is Imported on the First Visualization
 
 def randomString(length):
     letters = string.ascii_lowercase
@@ -27,33 +26,37 @@ def visualizeAnalytic(analytic, results):
     :param results: The Map of Results from the Chosen Analytic.
     :return: The Saved Visualization Filename to the Web Interface.
     '''
-    # If Results are None, Plot a Blank Map
-    if results is None:
-        fig = go.Figure(data = go.Scattergeo(
-                 lon = [-100],
-                 lat = [40],
-                 text = None,
-                 mode = 'markers',
-                 marker_color = 1,))
-        fig.update_layout(title = 'Anomaly Locations on a US Map',
-                          geo_scope = 'usa')
-
-    else:
-        # Choose and Visualize the Selected Analytic
-        fig = go.Figure(data = go.Scattergeo(
-                 lon = [val[0] for val in results.values()],
-                 lat = [val[1] for val in results.values()],
-                 text = None,
-                 mode = 'markers',
-                 marker_color = 1,))
-        fig.update_layout(title = 'Anomaly Locations on a US Map',
-                          geo_scope = 'usa')
-
-    # Setup the Write Destination
-    pio.orca.config.executable = '/usr/bin/miniconda3/bin/orca'
-    writePath = 'software/analyze/static/images/'
-
-    # Write the Image Out to the Webpage
-    imageName = randomString(10) + '.png'
-    fig.write_image(os.path.join(writePath + imageName))
-    return imageName
+    with metrics.stage('visualizeAnalytic', rows = len(results) if results is not None else 0):
+        import plotly.graph_objects as go
+        import plotly.io as pio
+
+        # If Results are None, Plot a Blank Map
+        if results is None:
+            fig = go.Figure(data = go.Scattergeo(
+                     lon = [-100],
+                     lat = [40],
+                     text = None,
+                     mode = 'markers',
+                     marker_color = 1,))
+            fig.update_layout(title = 'Anomaly Locations on a US Map',
+                              geo_scope = 'usa')
+
+        else:
+            # Choose and Visualize the Selected Analytic
+            fig = go.Figure(data = go.Scattergeo(
+                     lon = [val[0] for val in results.values()],
+                     lat = [val[1] for val in results.values()],
+                     text = None,
+                     mode = 'markers',
+                     marker_color = 1,))
+            fig.update_layout(title = 'Anomaly Locations on a US Map',
+                              geo_scope = 'usa')
+
+        # Setup the Write Destination
+        pio.orca.config.executable = '/usr/bin/miniconda3/bin/orca'
+        writePath = 'software/analyze/static/images/'
+
+        # Write the Image Out to the Webpage
+        imageName = randomString(10) + '.png'
+        fig.write_image(os.path.join(writePath + imageName))
+        return imageName
@@ -0,0 +1,65 @@
+#! /usr/bin/python3.6
+'''
+Test the Headless Batch Mode.
+'''
+
+# System Functions
+import io
+import csv
+
+# PyTest Module
+import pytest
+import yaml
+np = pytest.importorskip('numpy')
+pytest.importorskip('sklearn')
+
+from software.analyze import batch
+
+def _getConfig():
+    with open('config.yml', 'r') as ymlFile:
+        return yaml.load(ymlFile, yaml.SafeLoader)
+
+def _getData(numRows = 2000):
+    rng = np.random.RandomState(582)
+    y = rng.normal(1850.0, 10.0, numRows)
+    y[:5] += 200.0
+    return {'latitude': rng.uniform(25.0, 50.0, numRows),
+            'longitude': rng.uniform(-125.0, -67.0, numRows),
+            'time': rng.uniform(2.8e8, 2.9e8, numRows),
+            'methane_mixing_ratio_bias_corrected': y}
+
+def test_spatial_index_matches_bounding_box():
+    M = _getData()
+    index = batch.SpatialIndex(M)
+    subM = index.select((30.0, 40.0), (-110.0, -90.0))
+    inBox = (M['latitude'] >= 30.0) & (M['latitude'] <= 40.0) & \
+            (M['longitude'] >= -110.0) & (M['longitude'] <= -90.0)
+    assert subM['latitude'].shape[0] == inBox.sum()
+    assert np.array_equal(np.sort(subM['methane_mixing_ratio_bias_corrected']),
+                          np.sort(M['methane_mixing_ratio_bias_corrected'][inBox]))
+
+def test_run_jobs_writes_csv():
+    jobs = [{'name': 'all', 'method': 'Isolation Forest', 'latBox': None, 'lonBox': None,
+             'startDate': None, 'endDate': None},
+            {'name': 'empty', 'method': 'Local Outlier Factor', 'latBox': (0.0, 1.0), 'lonBox': None,
+             'startDate': None, 'endDate': None}]
+    rows = batch.runJobs(_getData(), _getConfig(), jobs, workers = 1)
+    assert len(rows) > 0 and all(row['job'] == 'all' for row in rows)
+    assert [row['rank'] for row in rows] == list(range(1, len(rows) + 1))
+
+    outFile = io.StringIO()
+    batch.writeResults(rows, outFile, 'csv')
+    outFile.seek(0)
+    assert len(list(csv.DictReader(outFile))) == len(rows)
+
+def test_parquet_refuses_standard_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rows = [{'job': 'all', 'method': 'Isolation Forest', 'rank': 1, 'longitude': -100.0, 'latitude': 30.0}]
+
+    # Batch Mode Points sys.stdout at Standard Error, so the Outfile Default is the Original Stream
+    monkeypatch.setattr(batch.sys, 'stdout', batch.sys.stderr)
+    for outFile in (batch.sys.__stdout__, io.StringIO()):
+        with pytest.raises(SystemExit):
+            batch.writeResults(rows, outFile, 'parquet')
+    assert list(tmp_path.iterdir()) == []
+    assert not batch.sys.__stdout__.closed
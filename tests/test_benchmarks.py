@@ -0,0 +1,28 @@
+#! /usr/bin/python3.6
+'''
+Test that the Benchmark Suite's Synthetic Orbits Run through the Real Pipeline.
+'''
+
+# System Functions
+import json
+
+# PyTest Module
+import pytest
+pytest.importorskip('numpy')
+pytest.importorskip('h5py')
+pytest.importorskip('netCDF4')
+
+from benchmarks import run
+
+def test_benchmark_small_size(tmp_path):
+    outFile = tmp_path / 'bench.json'
+    stages = ['collectData', 'applyDateFilter', 'enforceBoundingBox', 'removeCommonData']
+    assert run.main(['--sizes', '2000', '--stages'] + stages + ['--out', str(outFile)]) == 0
+
+    report = json.loads(outFile.read_text())
+    results = report['results']['2000']
+    assert set(stages) <= set(results)
+    assert 0 < results['collectData']['rows'] <= 2000
+    assert all(results[stage]['peakBytes'] > 0 for stage in stages)
+    assert run.main(['--sizes', '2000', '--stages'] + stages[1:] + ['--baseline', str(outFile),
+                     '--tolerance', '1000']) == 0
@@ -0,0 +1,96 @@
+#! /usr/bin/python3.6
+'''
+Test the Ensemble of Detection Methods on One Shared Thresholded Response.
+'''
+
+# System Functions
+import io
+import csv
+import copy
+import yaml
+
+# PyTest Module
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('sklearn')
+
+from software.analyze import batch
+from software.analyze.AnomalyDetector import AnomalyDetector, normalizeScores
+
+with open('config.yml', 'r') as ymlFile:
+    CONFIG = yaml.load(ymlFile, yaml.SafeLoader)
+
+def _getData(numRows = 4000, numPlumes = 8):
+    rng = np.random.RandomState(37)
+    response = rng.normal(1850.0, 15.0, numRows)
+    plumes = rng.choice(numRows, numPlumes, replace = False)
+    response[plumes] += np.linspace(250.0, 400.0, numPlumes)
+    M = {'latitude': rng.uniform(25.0, 50.0, numRows),
+         'longitude': rng.uniform(-125.0, -67.0, numRows),
+         'time': np.zeros(numRows),
+         CONFIG['model']['response']: response}
+    return M, plumes
+
+def test_normalize_scores():
+    assert normalizeScores([3.0, 1.0, 2.0, 2.0]).tolist() == [1.0, 0.0, 0.5, 0.5]
+    z = normalizeScores([1.0, 2.0, 3.0], 'zscore')
+    assert np.isclose(z.mean(), 0.0) and np.isclose(z.std(), 1.0)
+    assert normalizeScores([5.0, 5.0], 'zscore').tolist() == [0.0, 0.0]
+
+@pytest.mark.parametrize('normalization', ['rank', 'zscore'])
+def test_ensemble_consensus_ranking(normalization):
+    M, plumes = _getData()
+    config = copy.deepcopy(CONFIG)
+    config['AnomalyDetector']['method'] = 'Ensemble'
+    config['AnomalyDetector']['EnsembleHyperparameters'].update({'methods': ['Local Outlier Factor',
+                                                                             'Isolation Forest'],
+                                                                 'normalization': normalization})
+    results = AnomalyDetector(config, M).detectAnomalies()
+    assert len(results) >= len(plumes)
+
+    # Every Anomaly Carries the Consensus and Per-Method Scores, Best First
+    scores = [results[rank][2] for rank in sorted(results)]
+    assert set(scores[0]) == {'consensus', 'Local Outlier Factor', 'Isolation Forest'}
+    consensus = [s['consensus'] for s in scores]
+    assert consensus == sorted(consensus, reverse = True)
+
+    # The Injected Plumes Lead the Consensus Ranking
+    top = set((results[rank][0], results[rank][1]) for rank in range(1, len(plumes) + 1))
+    assert top == set(zip(M['longitude'][plumes].tolist(), M['latitude'][plumes].tolist()))
+
+def test_batch_ensemble_job_reports_scores():
+    M, plumes = _getData()
+    jobs = [{'name': 'all', 'method': 'Ensemble', 'methods': ['Local Outlier Factor', 'Isolation Forest'],
+             'latBox': None, 'lonBox': None, 'region': None, 'startDate': None, 'endDate': None}]
+    rows = batch.runJobs(M, copy.deepcopy(CONFIG), jobs, workers = 1)
+    outFile = io.StringIO()
+    batch.writeResults(rows, outFile, 'csv')
+    header = next(csv.reader(io.StringIO(outFile.getvalue())))
+    assert header[:len(batch.COLUMNS)] == batch.COLUMNS
+    assert {'consensus score', 'Local Outlier Factor score', 'Isolation Forest score'} <= set(header)
+
+def test_ensemble_autoencoder_scores_full_response(monkeypatch):
+    M, plumes = _getData()
+    config = copy.deepcopy(CONFIG)
+    config['AnomalyDetector']['method'] = 'Ensemble'
+    config['AnomalyDetector']['EnsembleHyperparameters']['methods'] = ['Isolation Forest', 'Autoencoder']
+    detector = AnomalyDetector(config, M)
+    seen = {}
+    def scoreWithAutoencoder(X, hpMap):
+        seen['rows'] = X.shape[0]
+        return X[:, 0] > 2000.0, X[:, 0]
+    monkeypatch.setattr(detector, 'scoreWithAutoencoder', scoreWithAutoencoder)
+    results = detector.detectAnomalies()
+
+    # Like the Standalone Method, the Autoencoder Sees Every Observation
+    assert seen['rows'] == M['latitude'].shape[0]
+    assert len(results) >= len(plumes)
+
+def test_batch_ensemble_job_without_ensemble_section():
+    M, plumes = _getData()
+    config = copy.deepcopy(CONFIG)
+    del config['AnomalyDetector']['EnsembleHyperparameters']
+    jobs = [{'name': 'all', 'method': 'Ensemble', 'methods': ['Local Outlier Factor', 'Isolation Forest'],
+             'latBox': None, 'lonBox': None, 'region': None, 'startDate': None, 'endDate': None}]
+    rows = batch.runJobs(M, config, jobs, workers = 1)
+    assert len(rows) >= len(plumes)
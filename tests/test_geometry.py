@@ -0,0 +1,100 @@
+#! /usr/bin/python3.6
+'''
+Test Polygon Regions and their Vectorized Point-in-Polygon Test.
+'''
+
+# System Functions
+import json
+
+# PyTest Module
+import pytest
+np = pytest.importorskip('numpy')
+
+from software import geometry
+from software.analyze import analyzer, batch
+
+# A Concave Basin-Like Outline with a Hole, and a Separate Triangle
+BASIN = [[[-104.0, 31.0], [-101.0, 31.0], [-101.0, 33.5], [-102.5, 32.0], [-104.0, 33.5], [-104.0, 31.0]],
+         [[-103.5, 31.3], [-103.0, 31.3], [-103.0, 31.8], [-103.5, 31.8], [-103.5, 31.3]]]
+TRIANGLE = [[[-100.0, 40.0], [-98.0, 40.0], [-99.0, 42.0]]]
+MULTIPOLYGON = {'type': 'Feature', 'properties': {'name': 'Test'},
+                'geometry': {'type': 'MultiPolygon', 'coordinates': [BASIN, TRIANGLE]}}
+
+def _rayCast(lat, lon, polygons):
+    '''
+    A Slow Point-by-Point Reference (Even-Odd Rule per Polygon, Union across Polygons).
+    '''
+    def insidePolygon(y, x, rings):
+        inside = False
+        for ring in rings:
+            ring = ring if ring[0] == ring[-1] else ring + [ring[0]]
+            for (x1, y1), (x2, y2) in zip(ring[:-1], ring[1:]):
+                if min(y1, y2) <= y < max(y1, y2) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                    inside = not inside
+        return inside
+    return np.array([any(insidePolygon(y, x, rings) for rings in polygons) for y, x in zip(lat, lon)])
+
+def _getPoints(numPoints = 20000):
+    rng = np.random.RandomState(35)
+    return rng.uniform(30.0, 43.0, numPoints), rng.uniform(-105.0, -97.0, numPoints)
+
+def test_contains_matches_reference():
+    lat, lon = _getPoints()
+    region = geometry.PolygonRegion(MULTIPOLYGON)
+    expected = _rayCast(lat, lon, [BASIN, TRIANGLE])
+    assert expected.sum() > 100
+    assert np.array_equal(region.contains(lat, lon), expected)
+
+    # Presorted Points Skip the Sort but Give the Same Answer
+    order = np.argsort(lat)
+    assert np.array_equal(region.contains(lat[order], lon[order], latSorted = True), expected[order])
+
+    # The Hole is Excluded
+    assert not region.contains(np.array([31.5]), np.array([-103.2]))[0]
+    assert region.contains(np.array([31.5]), np.array([-102.0]))[0]
+    assert region.latBox == (31.0, 42.0) and region.lonBox == (-104.0, -98.0)
+
+def test_geojson_sources(tmp_path):
+    fileName = tmp_path / 'basin.geojson'
+    fileName.write_text(json.dumps({'type': 'Polygon', 'coordinates': BASIN}))
+    collection = {'type': 'FeatureCollection', 'features': [MULTIPOLYGON]}
+    lat, lon = _getPoints(2000)
+    fromFile = geometry.PolygonRegion(str(fileName)).contains(lat, lon)
+    fromText = geometry.PolygonRegion(json.dumps({'type': 'Polygon', 'coordinates': BASIN})).contains(lat, lon)
+    assert np.array_equal(fromFile, fromText)
+    assert np.array_equal(geometry.PolygonRegion(collection).contains(lat, lon),
+                          geometry.PolygonRegion(MULTIPOLYGON).contains(lat, lon))
+    with pytest.raises(ValueError):
+        geometry.PolygonRegion({'type': 'Point', 'coordinates': [0.0, 0.0]})
+    with pytest.raises(ValueError):
+        geometry.PolygonRegion({'type': 'Polygon', 'coordinates': [[[0.0, 0.0], [1.0, 1.0]]]})
+
+def test_region_filters_agree():
+    lat, lon = _getPoints()
+    M = {'latitude': lat, 'longitude': lon, 'time': np.arange(lat.shape[0], dtype = np.float64)}
+    region = geometry.PolygonRegion(MULTIPOLYGON)
+    expected = np.sort(M['time'][_rayCast(lat, lon, [BASIN, TRIANGLE])])
+    assert np.array_equal(np.sort(analyzer.enforceRegion(M, region)['time']), expected)
+    assert np.array_equal(np.sort(batch.SpatialIndex(M).select(None, None, region)['time']), expected)
+
+    # Boxes and Polygons Intersect
+    boxed = batch.SpatialIndex(M).select((30.0, 35.0), (-105.0, -102.5), region)
+    assert np.array_equal(np.sort(boxed['time']),
+                          np.sort(analyzer.enforceBoundingBox(analyzer.enforceRegion(M, region),
+                                                              (30.0, 35.0), (-105.0, -102.5))['time']))
+
+@pytest.mark.parametrize('geoJSON', ['"/etc/hostname"', '"/no/such/file"', '[1, 2]'])
+def test_form_geojson_is_never_a_path(geoJSON):
+    pytest.importorskip('flask_restful')
+    import yaml
+    from software.analyze.service import MethaneService
+    with open('config.yml', 'r') as ymlFile:
+        config = yaml.load(ymlFile, yaml.SafeLoader)
+    client = MethaneService(config, {}).app.test_client()
+    form = {'analytic': 'Isolation Forest', 'minLat': '', 'maxLat': '', 'minLon': '', 'maxLon': '',
+            'startDate': '', 'endDate': '', 'geojson': geoJSON}
+    response = client.post('/tropomi', data = form)
+
+    # Existing and Missing Files Get the Same Answer, without Opening Either
+    assert response.status_code == 400
+    assert response.get_data(as_text = True) == 'Invalid Polygon Region: GeoJSON Must be an Object.'
@@ -0,0 +1,101 @@
+#! /usr/bin/python3.6
+'''
+Test the Pipeline Stage Instrumentation and its Prometheus Export.
+'''
+
+# System Functions
+import threading
+
+# PyTest Module
+import pytest
+
+from software import metrics
+
+def test_stage_records_calls_rows_and_peak():
+    registry = metrics.MetricsRegistry()
+    metrics.traceMemory(True)
+    try:
+        with registry.stage('outer', rows = 10):
+            with registry.stage('inner') as record:
+                buffer = bytearray(4 * 2 ** 20)
+                record['rows'] = 5
+            del buffer
+        with registry.stage('outer', rows = 10):
+            pass
+    finally:
+        metrics.traceMemory(False)
+
+    assert registry.stages['outer']['calls'] == 2
+    assert registry.stages['outer']['rows'] == 20
+    assert registry.stages['inner']['rows'] == 5
+    if hasattr(metrics.tracemalloc, 'reset_peak'):
+        assert registry.stages['inner']['peakBytes'] >= 4 * 2 ** 20
+        assert registry.stages['outer']['peakBytes'] >= registry.stages['inner']['peakBytes']
+
+def test_peak_needs_reset_peak(monkeypatch):
+    monkeypatch.delattr(metrics.tracemalloc, 'reset_peak', raising = False)
+    registry = metrics.MetricsRegistry()
+    metrics.traceMemory(True)
+    try:
+        with registry.stage('outer') as record:
+            buffer = bytearray(2 ** 20)
+    finally:
+        metrics.traceMemory(False)
+    assert record['peakBytes'] is None
+
+def test_cpu_time_includes_worker_threads():
+    registry = metrics.MetricsRegistry()
+    def spin():
+        end = metrics.time.thread_time() + 0.2
+        while metrics.time.thread_time() < end:
+            pass
+    with registry.stage('outer'):
+        workers = [threading.Thread(target = spin) for i in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    assert registry.stages['outer']['cpuSeconds'] >= 0.3
+
+def test_concurrent_stages_void_peaks():
+    registry = metrics.MetricsRegistry()
+    records = {}
+    def work():
+        with registry.stage('worker') as record:
+            records['worker'] = record
+            buffer = bytearray(2 ** 20)
+    metrics.traceMemory(True)
+    try:
+        with registry.stage('outer') as record:
+            records['outer'] = record
+            worker = threading.Thread(target = work)
+            worker.start()
+            worker.join()
+        with registry.stage('after') as record:
+            records['after'] = record
+    finally:
+        metrics.traceMemory(False)
+    assert records['outer']['peakBytes'] is None and records['worker']['peakBytes'] is None
+    assert records['after']['peakBytes'] is not None
+
+def test_prometheus_text_format():
+    registry = metrics.MetricsRegistry()
+    with registry.stage('removeCommonData', rows = 3):
+        pass
+    text = registry.toPrometheus()
+    assert '# TYPE tropomi_stage_seconds_total counter' in text
+    assert 'tropomi_stage_rows_total{stage="removeCommonData"} 3' in text
+
+def test_metrics_endpoint():
+    pytest.importorskip('flask_restful')
+    import yaml
+    from software.analyze.service import MethaneService
+    with open('config.yml', 'r') as ymlFile:
+        config = yaml.load(ymlFile, yaml.SafeLoader)
+    with metrics.stage('enforceBoundingBox', rows = 1):
+        pass
+    client = MethaneService(config, {}).app.test_client()
+    response = client.get('/tropomi/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert b'tropomi_stage_calls_total{stage="enforceBoundingBox"}' in response.data
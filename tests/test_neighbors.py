@@ -0,0 +1,74 @@
+#! /usr/bin/python3.6
+'''
+Test the Approximate Neighbour Index and the Local Outlier Factor Computed from it.
+'''
+
+# System Functions
+import copy
+import yaml
+
+# PyTest Module
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('sklearn')
+
+from sklearn.neighbors import LocalOutlierFactor, NearestNeighbors
+from software.analyze import neighbors
+from software.analyze.AnomalyDetector import AnomalyDetector
+
+with open('config.yml', 'r') as ymlFile:
+    CONFIG = yaml.load(ymlFile, yaml.SafeLoader)
+
+def test_projection_index_is_exact_in_one_dimension():
+    X = np.random.RandomState(36).normal(1850.0, 15.0, (5000, 1))
+    distances, indices = neighbors.ProjectionIndex(X, metric = 'manhattan').query(20)
+    exactD, exactI = NearestNeighbors(n_neighbors = 20, metric = 'manhattan').fit(X).kneighbors()
+    assert np.allclose(distances, exactD)
+
+    # The Vectorized LOF Matches scikit-learn's
+    LOF = LocalOutlierFactor(n_neighbors = 20, metric = 'manhattan').fit(X)
+    assert np.allclose(neighbors.localOutlierFactor(distances, indices), -LOF.negative_outlier_factor_)
+
+def test_projection_index_recall_in_more_dimensions():
+    X = np.random.RandomState(36).normal(size = (5000, 3))
+    distances, indices = neighbors.getIndex('projection', X, {}).query(10)
+    report = neighbors.validate(X, distances, indices, 'projection', {}, sampleSize = 2000)
+    assert report['sampleSize'] == 2000
+    assert report['neighborRecall'] > 0.9 and report['scoreRankCorrelation'] > 0.9
+
+    # Validating Every Row Agrees with Exact Neighbours and scikit-learn's LOF on All the Data
+    exactD, exactI = NearestNeighbors(n_neighbors = 10).fit(X).kneighbors()
+    LOF = -LocalOutlierFactor(n_neighbors = 10).fit(X).negative_outlier_factor_
+    exact = neighbors.validate(X, exactD, exactI, 'exact', {}, sampleSize = 5000)
+    assert exact['neighborRecall'] == 1.0 and exact['kDistanceError'] < 1e-12
+    assert exact['scoreRankCorrelation'] > 0.999999
+    rows = np.sort(np.random.RandomState(0).choice(5000, 300, replace = False))
+    model = NearestNeighbors().fit(X)
+    assert np.allclose(neighbors._exactOutlierFactor(model, X, rows, 10)[0], LOF[rows])
+
+    # A Poor Full-Data Graph Shows Up even when the Sample is Small
+    poorD, poorI = neighbors.ProjectionIndex(X, numProjections = 1, window = 10, numRefinements = 0).query(10)
+    poor = neighbors.validate(X, poorD, poorI, 'projection', {}, sampleSize = 500)
+    assert poor['neighborRecall'] < report['neighborRecall']
+    with pytest.raises(ValueError):
+        neighbors.getIndex('missing', X, {})
+
+def test_detector_ranks_match_exact():
+    rng = np.random.RandomState(36)
+    numRows = 4000
+    response = rng.normal(1850.0, 15.0, numRows)
+    response[rng.choice(numRows, 10, replace = False)] += 300.0
+    M = {'latitude': rng.uniform(25.0, 50.0, numRows),
+         'longitude': rng.uniform(-125.0, -67.0, numRows),
+         CONFIG['model']['response']: response}
+
+    exactConfig = copy.deepcopy(CONFIG)
+    exactConfig['AnomalyDetector']['method'] = 'Local Outlier Factor'
+    exactConfig['AnomalyDetector']['LocalOutlierFactorHyperparameters']['neighborIndex'] = 'exact'
+    approxConfig = copy.deepcopy(exactConfig)
+    approxConfig['AnomalyDetector']['LocalOutlierFactorHyperparameters'].update({'neighborIndex': 'projection',
+                                                                                 'validationSample': 1000})
+    exact = AnomalyDetector(exactConfig, M)
+    approx = AnomalyDetector(approxConfig, M)
+    assert approx.detectAnomalies() == exact.detectAnomalies()
+    assert approx.validation['neighborRecall'] == 1.0
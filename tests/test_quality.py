@@ -0,0 +1,57 @@
+#! /usr/bin/python3.6
+'''
+Test the Quality Predicates Applied while Collecting and Loading Data.
+'''
+
+# System Functions
+import copy
+import yaml
+
+# PyTest Module
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('h5py')
+
+from software.collect import collector
+
+with open('config.yml', 'r') as ymlFile:
+    CONFIG = yaml.load(ymlFile, yaml.SafeLoader)
+
+def _getConfig(**quality):
+    config = copy.deepcopy(CONFIG)
+    config['model'].update({'minQA': None, 'maxSolarZenith': None, 'maxViewingZenith': None,
+                            'surfaceClasses': None, 'compactSchema': False})
+    config['model'].update(quality)
+    return config
+
+def test_quality_mask_combines_predicates():
+    M = {'latitude': np.zeros(6),
+         'qa_value': np.array([1.0, 0.4, 0.5, 2.55, 0.9, 0.9]),
+         'solar_zenith_angle': np.array([10.0, 10.0, 10.0, 10.0, 85.0, 10.0]),
+         'surface_classification': np.array([0, 0, 4, 0, 0, 255], dtype = np.uint8)}
+    config = _getConfig(minQA = 0.5, maxSolarZenith = 80.0, surfaceClasses = [0])
+    assert collector.applyQualityFilter(config, M)['qa_value'].tolist() == [1.0, 0.5]
+    assert collector.getQualityMask(_getConfig(), M.get, 6) is None
+
+    # Predicates on Variables the Data Lacks are Skipped
+    assert collector.applyQualityFilter(config, {'latitude': np.zeros(2), 'qa_value': np.ones(2)}) \
+                    ['qa_value'].shape == (2,)
+
+def test_collect_data_drops_low_quality_pixels(tmp_path, monkeypatch):
+    pytest.importorskip('netCDF4')
+    from benchmarks import synthetic
+    config = _getConfig(minQA = 0.5, maxViewingZenith = 60.0)
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    ncList = synthetic.writeOrbits('data', config, 5000, seed = 33)
+
+    M = collector.collectData(config, ncList)
+    qa, angle = M['qa_value'][:], M['viewing_zenith_angle'][:]
+    M.close()
+    assert qa.shape[0] > 0 and np.all(qa >= 0.5) and np.all(angle <= 60.0)
+
+    unfiltered = collector.collectData(_getConfig(), ncList)
+    numRows = unfiltered['qa_value'].shape[0]
+    expected = np.sum((unfiltered['qa_value'][:] >= 0.5) & (unfiltered['viewing_zenith_angle'][:] <= 60.0))
+    unfiltered.close()
+    assert qa.shape[0] == expected < numRows
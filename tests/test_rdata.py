@@ -0,0 +1,127 @@
+#! /usr/bin/python3.6
+'''
+Test the Native RData/RDS Reader against Hand-Serialized XDR Streams.
+'''
+
+# System Functions
+import gzip
+import struct
+
+# PyTest Module
+import pytest
+np = pytest.importorskip('numpy')
+
+from software.collect import rdata
+
+# Helpers to Write a Tiny XDR Serialization Stream
+def _int(value):
+    return struct.pack('>i', value)
+
+def _flags(sexpType, hasAttr = False, hasTag = False, isObject = False, levels = 0):
+    return _int(sexpType | (hasAttr << 9) | (hasTag << 10) | (isObject << 8) | (levels << 12))
+
+def _char(text):
+    raw = text.encode('utf-8')
+    return _flags(rdata.CHARSXP, levels = 64) + _int(len(raw)) + raw
+
+def _sym(name):
+    return _flags(rdata.SYMSXP) + _char(name)
+
+def _strVector(values):
+    return _flags(rdata.STRSXP) + _int(len(values)) + b''.join(_char(v) for v in values)
+
+def _pairlist(cells, sexpType = rdata.LISTSXP):
+    stream = b''
+    for tag, value in cells:
+        stream += _flags(sexpType, hasTag = True) + _sym(tag) + value
+    return stream + _int(rdata.NILVALUE_SXP)
+
+def _dataFrame(columns):
+    stream = _flags(rdata.VECSXP, hasAttr = True, isObject = True) + _int(len(columns))
+    for name, (sexpType, values) in columns.items():
+        dtype = '>f8' if sexpType == rdata.REALSXP else '>i4'
+        stream += _flags(sexpType) + _int(len(values)) + np.asarray(values, dtype = dtype).tobytes()
+    rowNames = _flags(rdata.INTSXP) + _int(2) + np.array([rdata.NA_INTEGER, -3], dtype = '>i4').tobytes()
+    return stream + _pairlist([('names', _strVector(list(columns))),
+                               ('class', _strVector(['data.frame'])),
+                               ('row.names', rowNames)])
+
+def _header():
+    return b'X\n' + _int(3) + _int(0x040000) + _int(0x030500) + _int(5) + b'UTF-8'
+
+def test_read_rdata_data_frame(tmp_path):
+    frame = _dataFrame({'latitude': (rdata.REALSXP, [30.5, 31.0, 32.25]),
+                        'qa_value': (rdata.INTSXP, [100, rdata.NA_INTEGER, 50])})
+    fileName = tmp_path / 'frame.RData'
+    fileName.write_bytes(gzip.compress(b'RDX3\n' + _header() + _pairlist([('AidanData', frame)])))
+
+    M = rdata.getDataFrame(str(fileName), 'AidanData')
+    assert M['latitude'].dtype == np.float64
+    assert np.array_equal(M['latitude'], [30.5, 31.0, 32.25])
+    assert M['qa_value'][0] == 100 and np.isnan(M['qa_value'][1])
+
+def test_read_rds_data_frame(tmp_path):
+    frame = _dataFrame({'time': (rdata.REALSXP, [1.0, 2.0, 3.0])})
+    fileName = tmp_path / 'frame.rds'
+    fileName.write_bytes(_header() + frame)
+
+    M = rdata.getDataFrame(str(fileName))
+    assert np.array_equal(M['time'], [1.0, 2.0, 3.0])
+
+def test_read_rdata_rejects_ascii(tmp_path):
+    fileName = tmp_path / 'frame.RData'
+    fileName.write_bytes(b'RDA3\nA\n')
+    with pytest.raises(ValueError):
+        rdata.readRData(str(fileName))
+
+def _altrep(className, state, attributes = b''):
+    info = b''
+    for value in (_sym(className), _sym('base'), _flags(rdata.INTSXP) + _int(1) + _int(rdata.INTSXP)):
+        info += _flags(rdata.LISTSXP) + value
+    info += _int(rdata.NILVALUE_SXP)
+    return _flags(rdata.ALTREP_SXP) + info + state + (attributes or _int(rdata.NILVALUE_SXP))
+
+def test_read_altrep_vectors(tmp_path):
+    sequence = _altrep('compact_intseq', _flags(rdata.REALSXP) + _int(3) + \
+                                         np.array([4.0, 10.0, 2.0], dtype = '>f8').tobytes())
+    real = _flags(rdata.REALSXP) + _int(2) + np.array([1.5, 2.5], dtype = '>f8').tobytes()
+    wrapped = _altrep('wrap_real', _flags(rdata.LISTSXP) + real + _flags(rdata.LISTSXP) + \
+                                   _flags(rdata.INTSXP) + _int(2) + _int(0) + _int(0) + _int(rdata.NILVALUE_SXP))
+    deferred = _altrep('deferred_string', _flags(rdata.LISTSXP) + _flags(rdata.INTSXP) + _int(2) + _int(7) + \
+                                          _int(8) + _int(rdata.NILVALUE_SXP))
+    fileName = tmp_path / 'altrep.RData'
+    fileName.write_bytes(b'RDX3\n' + _header() + _pairlist([('sequence', sequence),
+                                                            ('wrapped', wrapped),
+                                                            ('deferred', deferred)]))
+
+    objects = rdata.readRData(str(fileName))
+    assert objects['sequence'].sexpType == rdata.INTSXP
+    assert objects['sequence'].value.tolist() == [10, 12, 14, 16]
+    assert objects['wrapped'].sexpType == rdata.REALSXP
+    assert objects['wrapped'].value.tolist() == [1.5, 2.5]
+    assert objects['deferred'].value == ['7', '8']
+
+def test_read_rdata_truncated(tmp_path):
+    frame = _dataFrame({'time': (rdata.REALSXP, [1.0, 2.0, 3.0])})
+    fileName = tmp_path / 'frame.RData'
+    fileName.write_bytes(b'RDX3\n' + _header() + _pairlist([('AidanData', frame)])[:-20])
+    with pytest.raises(struct.error):
+        rdata.readRData(str(fileName))
+
+@pytest.mark.parametrize('error', [ValueError('Only XDR Serialized R Data is Supported.'), struct.error('truncated')])
+def test_rdata_falls_back_to_rpy2(monkeypatch, error):
+    from software.collect import collector
+    config = {'model': {'RDataFileName': 'AidanData.Rdata', 'RDataFrameName': 'AidanData',
+                        'startDate': None, 'endDate': None, 'compactSchema': False}}
+    calls = []
+    def getDataFrame(fileName, frameName):
+        raise error
+    def getDataWithR(fileName, frameName):
+        calls.append((fileName, frameName))
+        return {'time': np.array([1.0, 2.0]), 'latitude': np.array([30.0, 31.0])}
+    monkeypatch.setattr(rdata, 'getDataFrame', getDataFrame)
+    monkeypatch.setattr(collector, '_getDataFromRDataWithR', getDataWithR)
+
+    M = collector.getDataFromRData(config)
+    assert calls == [('data/AidanData.Rdata', 'AidanData')]
+    assert np.array_equal(M['latitude'], [30.0, 31.0])
@@ -0,0 +1,77 @@
+#! /usr/bin/python3.6
+'''
+Test Collecting Several Regions in One Pass over the Orbit Files.
+'''
+
+# System Functions
+import copy
+import yaml
+
+# PyTest Module
+import pytest
+np = pytest.importorskip('numpy')
+pytest.importorskip('h5py')
+pytest.importorskip('netCDF4')
+
+from benchmarks import synthetic
+from software.collect import collector, storage
+
+with open('config.yml', 'r') as ymlFile:
+    CONFIG = yaml.load(ymlFile, yaml.SafeLoader)
+
+REGIONS = [{'name': 'South', 'latLower': 25.0, 'latUpper': 35.0, 'lonLower': -125.0, 'lonUpper': -90.0},
+           {'name': 'North', 'latLower': 40.0, 'latUpper': 50.0, 'lonLower': -100.0, 'lonUpper': -67.0}]
+
+def test_regions_match_single_region_collection(tmp_path, monkeypatch):
+    config = copy.deepcopy(CONFIG)
+    config['model'].update({'regions': REGIONS, 'h5FileName': 'store.h5'})
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    ncList = synthetic.writeOrbits('data', config, 20000, seed = 34)
+
+    fileNames = collector.collectRegions(config, ncList)
+    assert fileNames == {config['model']['regionName']: 'store.h5',
+                         'South': 'store_South.h5', 'North': 'store_North.h5'}
+
+    # Each Region's Store Holds Exactly what Collecting that Region Alone Would
+    for region in REGIONS:
+        together = storage.readH5('data/' + fileNames[region['name']])
+        regionConfig = collector.selectRegion(config, region['name'])
+        assert regionConfig['model']['h5FileName'] == fileNames[region['name']]
+        collector.collectData(regionConfig, ncList).close()
+        alone = storage.readH5('data/' + fileNames[region['name']])
+        assert set(together) == set(alone)
+        assert together['latitude'].shape[0] > 0
+        assert all(np.array_equal(together[v], alone[v]) for v in alone)
+        assert np.all((together['latitude'] > region['latLower']) & (together['latitude'] < region['latUpper']))
+
+def test_regions_written_when_main_region_is_empty(tmp_path, monkeypatch):
+    config = copy.deepcopy(CONFIG)
+    config['model'].update({'regions': REGIONS, 'h5FileName': 'store.h5'})
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    ncList = synthetic.writeOrbits('data', config, 20000, seed = 34)
+
+    # No Pixel Falls in the Main Region, but the Named Regions Still Get Stores
+    config['model'].update({'latLower': -1.0, 'latUpper': 1.0, 'lonLower': -1.0, 'lonUpper': 1.0})
+    fileNames = collector.collectRegions(config, ncList)
+    assert fileNames == {'South': 'store_South.h5', 'North': 'store_North.h5'}
+    assert not (tmp_path / 'data' / 'store.h5').exists()
+    with pytest.raises(SystemExit):
+        collector.collectData(config, ncList)
+
+def test_polygon_region_collection(tmp_path, monkeypatch):
+    triangle = {'type': 'Polygon', 'coordinates': [[[-120.0, 30.0], [-80.0, 30.0], [-100.0, 48.0], [-120.0, 30.0]]]}
+    config = copy.deepcopy(CONFIG)
+    config['model'].update({'regions': [{'name': 'Triangle', 'geojson': triangle}], 'h5FileName': 'store.h5'})
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    ncList = synthetic.writeOrbits('data', config, 20000, seed = 35)
+
+    fileNames = collector.collectRegions(config, ncList)
+    full = storage.readH5('data/' + fileNames[config['model']['regionName']])
+    inside = storage.readH5('data/' + fileNames['Triangle'])
+    region = collector.getRegions(config)[1]['polygon']
+    assert 0 < inside['latitude'].shape[0] < full['latitude'].shape[0]
+    assert np.all(region.contains(inside['latitude'], inside['longitude']))
+    assert collector.selectRegion(config, 'Triangle')['model']['latUpper'] == 48.0
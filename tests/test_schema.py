@@ -0,0 +1,77 @@
+#! /usr/bin/python3.6
+'''
+Test the Compact Schema for Collected Data.
+'''
+
+# PyTest Module
+import pytest
+np = pytest.importorskip('numpy')
+h5py = pytest.importorskip('h5py')
+
+from software.collect import schema, storage
+
+CONFIG = {'model': {'compactSchema': True, 'quantizeCorners': True}}
+
+def _getColumns(numRows = 1000):
+    rng = np.random.RandomState(32)
+    lat = rng.uniform(25.0, 50.0, numRows)
+    return {'time': rng.uniform(0.0, 3e8, numRows),
+            'latitude': lat,
+            'qa_value': rng.choice([0.0, 0.4, 0.5, 1.0], size = numRows),
+            'surface_classification': rng.randint(0, 8, size = numRows).astype(np.float64),
+            'methane_mixing_ratio': rng.normal(1850.0, 15.0, numRows),
+            'latLowLeft': lat - 0.0213}
+
+def test_compact_dtypes_round_trip():
+    columns = _getColumns()
+    M, attributes = schema.toCompact(columns, CONFIG)
+    assert M['qa_value'].dtype == np.uint8
+    assert M['surface_classification'].dtype == np.uint8
+    assert M['time'].dtype == np.int32
+    assert M['methane_mixing_ratio'].dtype == np.float32
+    assert M['latLowLeft'].dtype == np.int16
+    assert attributes['qa_value']['scale_factor'] == schema.QA_SCALE
+
+    assert np.allclose(schema.decode(M, 'qa_value'), columns['qa_value'], atol = 1e-6)
+    assert np.allclose(schema.decode(M, 'latLowLeft'), columns['latLowLeft'], atol = 1e-4)
+    assert np.array_equal(M['time'], np.floor(columns['time']).astype(np.int32))
+
+    # Already Compact Columns are Left Alone
+    again, _ = schema.toCompact(M, CONFIG)
+    assert all(np.array_equal(again[v], M[v]) for v in M)
+
+def test_fill_values_are_encoded():
+    M, _ = schema.toCompact({'qa_value': np.array([0.5, np.nan, 9.96921e+36]),
+                             'surface_classification': np.array([3.0, np.nan, 1e30])}, CONFIG)
+    assert M['qa_value'].tolist() == [50, 0, 0]
+    assert M['surface_classification'].tolist() == [3, 255, 255]
+
+def test_overflowing_corners_are_widened():
+    lon = np.array([179.99, -100.0, np.nan])
+    columns = {'longitude': lon, 'lonLowLeft': np.array([-179.99, -100.01, np.nan]),
+               'latitude': np.zeros(3), 'latLowLeft': np.array([0.01, -0.01, np.nan])}
+    M, attributes = schema.toCompact(columns, CONFIG)
+    assert M['lonLowLeft'].dtype == np.float32 and 'lonLowLeft' not in attributes
+    assert np.allclose(schema.decode(M, 'lonLowLeft'), columns['lonLowLeft'], equal_nan = True)
+    assert M['latLowLeft'].dtype == np.int16
+
+    # Joining a Widened Part with a Quantized One Decodes the Quantized One
+    other, _ = schema.toCompact({'longitude': lon[1:2], 'lonLowLeft': np.array([-100.02]),
+                                 'latitude': np.zeros(1), 'latLowLeft': np.array([0.02])}, CONFIG)
+    assert other['lonLowLeft'].dtype == np.int16
+    joined, attributes = schema.concatenate([M, other], CONFIG)
+    assert joined['lonLowLeft'].dtype == np.float32
+    assert np.allclose(joined['lonLowLeft'], [-179.99, -100.01, np.nan, -100.02], equal_nan = True, atol = 1e-4)
+    assert joined['latLowLeft'].dtype == np.int16 and attributes['latLowLeft']['relative_to'] == 'latitude'
+
+def test_compact_store_is_smaller(tmp_path):
+    columns = _getColumns(20000)
+    M, attributes = schema.toCompact(columns, CONFIG)
+    fullName, compactName = str(tmp_path / 'full.h5'), str(tmp_path / 'compact.h5')
+    storage.writeH5(fullName, columns)
+    storage.writeH5(compactName, M, attributes = attributes)
+    with h5py.File(compactName, 'r') as h5File:
+        assert h5File['qa_value'].attrs['scale_factor'] == schema.QA_SCALE
+        assert h5File['latLowLeft'].attrs['relative_to'] == 'latitude'
+    assert storage.readH5(compactName)['qa_value'].dtype == np.uint8
+    assert tmp_path.joinpath('compact.h5').stat().st_size < 0.6 * tmp_path.joinpath('full.h5').stat().st_size
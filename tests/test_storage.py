@@ -0,0 +1,53 @@
+#! /usr/bin/python3.6
+'''
+Test the Chunked, Time-Sorted H5 Storage Layout.
+'''
+
+# PyTest Module
+import pytest
+np = pytest.importorskip('numpy')
+h5py = pytest.importorskip('h5py')
+
+from software.collect import storage
+
+def _getColumns(numRows = 10000):
+    rng = np.random.RandomState(31)
+    return {'time': rng.uniform(0.0, 1000.0, numRows),
+            'latitude': rng.uniform(25.0, 50.0, numRows),
+            'longitude': rng.uniform(-125.0, -67.0, numRows),
+            'qa_value': rng.uniform(0.0, 1.0, numRows)}
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_chunked_time_window_read_is_exact(tmp_path, compression):
+    columns = _getColumns()
+    fileName = str(tmp_path / 'store.h5')
+    storage.writeH5(fileName, columns, layout = 'chunked', chunkRows = 512, compression = compression)
+    assert storage.isChunked(fileName)
+
+    M = storage.readH5(fileName, timeRange = (200.0, 450.0))
+    inWindow = (columns['time'] >= 200.0) & (columns['time'] <= 450.0)
+    assert np.all(np.diff(M['time']) >= 0)
+    assert np.array_equal(np.sort(M['qa_value']), np.sort(columns['qa_value'][inWindow]))
+
+    with h5py.File(fileName, 'r') as h5File:
+        assert h5File['time'].chunks == (512,)
+        runs = storage.getChunkRuns(h5File, timeRange = (200.0, 450.0))
+    assert len(runs) == 1 and runs[0][1] - runs[0][0] < 10000
+
+def test_chunked_index_holds_time_ranges(tmp_path):
+    columns = _getColumns()
+    fileName = str(tmp_path / 'store.h5')
+    storage.writeH5(fileName, columns, layout = 'chunked', chunkRows = 256)
+    with h5py.File(fileName, 'r') as h5File:
+        index = h5File[storage.INDEX_GROUP]
+        assert set(index) == {'time_min', 'time_max'}
+        assert index['time_min'].shape[0] == -(-10000 // 256)
+        assert storage.getChunkRuns(h5File) == [(0, 10000)]
+        assert storage.getChunkRuns(h5File, timeRange = (2000.0, 3000.0)) == []
+
+def test_flat_layout_round_trip(tmp_path):
+    columns = _getColumns(100)
+    fileName = str(tmp_path / 'store.h5')
+    storage.writeH5(fileName, columns)
+    assert not storage.isChunked(fileName)
+    assert np.array_equal(storage.readH5(fileName)['time'], columns['time'])
@@ -0,0 +1,27 @@
+#! /usr/bin/python3.6
+'''
+Test the Startup Stage Timer.
+'''
+
+# System Functions
+import json
+
+# PyTest Module
+import pytest
+
+from software.timing import StageTimer
+
+def test_stage_timer_report(tmp_path):
+    timer = StageTimer()
+    with timer.stage('config'):
+        pass
+    with timer.stage('loadData'):
+        pass
+    outFile = tmp_path / 'timing.jsonl'
+    timer.write(str(outFile))
+    timer.write(str(outFile))
+
+    reports = [json.loads(line) for line in outFile.read_text().splitlines()]
+    assert len(reports) == 2
+    assert [s['stage'] for s in reports[0]['stages']] == ['config', 'loadData']
+    assert reports[0]['version'] == '0.1.0'
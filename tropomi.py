@@ -11,9 +11,9 @@ import logging
 import yaml
 import warnings
 
-# Import the Service Tools
-from software.analyze.service import MethaneService
-from software.collect import collector
+# Startup Timing (the Service Tools Themselves are Imported Lazily in `main`,
+# so `--help` Does Not Pay for Flask, NetCDF, or the Analytics Stack)
+from software.timing import StageTimer
 
 # Create the Description
 DESC = '''Starts a Service (or a One-Time Command Line Run) to Allow the Methane Analysis Service to Examine the TROPOMI Data.'''
@@ -35,6 +35,26 @@ parser.add_argument('--log', '-l',
                     dest = 'logLevel',
                     choices = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'],
                     help = 'The Logging Level for the Service Run.')
+parser.add_argument('--batch', '-b',
+                    dest = 'batchFile',
+                    help = 'Path to a Jobs YAML File to Run Headlessly (No Web Service).')
+parser.add_argument('--format', '-f',
+                    dest = 'outFormat',
+                    choices = ['csv', 'parquet', 'ndjson'],
+                    help = 'The Batch Output Format. \
+                    \nDefaults to the Outfile Extension, else CSV.')
+parser.add_argument('--workers', '-w',
+                    type = int,
+                    help = 'The Number of Batch Worker Processes.')
+parser.add_argument('--collect',
+                    action = 'store_true',
+                    help = 'Collect Every Configured Region from the NetCDF Files in /data \
+                    \nin One Pass, then Exit.')
+parser.add_argument('--region', '-r',
+                    help = 'Analyze One of the Extra Named Regions Listed in the Configuration.')
+parser.add_argument('--timing',
+                    dest = 'timingFile',
+                    help = 'Append a JSON Report of Startup Stage Timings to this File.')
 
 def getConfig(args):
     '''
@@ -56,6 +76,29 @@ def getConfig(args):
         print('ERROR : No Valid Configuration Specified.\n')
         sys.exit(errno.EINVAL)
 
+def loadData(config):
+    '''
+    Load the Model Data from the Data Source Selected in the Configuration.
+
+    :param config: The Dictionary of Configuration Settings from the YAML.
+    :return: The Model Data Map.
+    '''
+    from software.collect import collector
+    if config['model']['readh5File']:
+        print('\nLoading Data from H5...')
+        M = collector.getDataFromH5(config)
+    elif config['model']['readRDataFile']:
+        print('\nLoading Data from RData...')
+        M = collector.getDataFromRData(config)
+    elif config['model']['readJSONFile']:
+        print('\nLoading Data from JSON...')
+        M = collector.getDataFromJSON(config)
+    else:
+        print('\nLoading Data from NetCDF...')
+        M = collector.getDataFromNetCDF(config)
+    print('Done!\n')
+    return M
+
 # Create the Main Method for the Service
 if __name__ == '__main__':
     # Supress Warnings
@@ -64,9 +107,16 @@ if __name__ == '__main__':
 
     # Get the Parsed CLI Arguments
     args = parser.parse_args()
+    timer = StageTimer()
+
+    # Batch Results May Go to Standard Output, so Send Progress Messages to
+    # Standard Error (the Outfile Still Holds the Original Standard Output)
+    if args.batchFile:
+        sys.stdout = sys.stderr
 
     # Get the Configuration from the YAML File
-    config = getConfig(args)
+    with timer.stage('config'):
+        config = getConfig(args)
 
     # Allow Overrides to the Configuration YAML from the CLI
     if args.logLevel:
@@ -83,29 +133,54 @@ if __name__ == '__main__':
         level = getattr(logging, config['logging']['level'])
     )
 
+    # Collect Every Region in One Pass over the Orbit Files and Exit
+    if args.collect:
+        from software.collect import collector
+        ncList = collector.getNCs()
+        if len(ncList) == 0:
+            print('ERROR : No NetCDF Files Reside in the /data Directory.\n')
+            sys.exit(errno.EINVAL)
+        with timer.stage('collectRegions'):
+            fileNames = collector.collectRegions(config, ncList)
+        for name in fileNames:
+            print('%s -> data/%s' % (name, fileNames[name]))
+        if args.timingFile:
+            timer.write(args.timingFile)
+        sys.exit(0)
+    if args.region:
+        from software.collect import collector
+        config = collector.selectRegion(config, args.region)
+
     # Get the Data for the Analysis Service
     try:
-        if config['model']['readh5File']:
-            print('\nLoading Data from H5...')
-            M = collector.getDataFromH5(config)
-            print('Done!\n')
-        elif config['model']['readRDataFile']:
-            print('\nLoading Data from RData...')
-            M = collector.getDataFromRData(config)
-            print('Done!\n')
-        elif config['model']['readJSONDataFile']:
-            print('\nLoading Data from JSON...')
-            M = collector.getDataFromJSON(config)
-            print('Done!\n')
-        else:
-            print('\nLoading Data from NetCDF...')
-            M = collector.getDataFromNetCDF(config)
-            print('Done!\n')
+        with timer.stage('loadData'):
+            M = loadData(config)
     except Exception as e:
         print('Failed.')
         print('ERROR : No Data Supplied.\n')
         sys.exit(errno.EINVAL)
 
+    # Run Batch Jobs Headlessly and Exit
+    if args.batchFile:
+        from software.analyze import batch
+        jobs = batch.loadJobs(args.batchFile)
+        with timer.stage('batch'):
+            rows = batch.runJobs(M, config, jobs['jobs'], args.workers or jobs.get('workers'))
+        batch.writeResults(rows, args.outfile, batch.getFormat(args.outfile, args.outFormat, jobs.get('format')))
+        logging.info('Batch Timing:\n%s' % timer)
+        if args.timingFile:
+            timer.write(args.timingFile)
+        sys.exit(0)
+
+    # Import the Web Service Stack
+    with timer.stage('importService'):
+        from software.analyze.service import MethaneService
+
+    # Report the Startup Cost
+    logging.info('Startup Timing:\n%s' % timer)
+    if args.timingFile:
+        timer.write(args.timingFile)
+
     # Activate the Service
     logging.info('Starting Service...')
     service = MethaneService(config, M)